@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Student, GymSession, DailyGymStats, Feedback
+from .models import Student, GymSession, DailyGymStats, StudentAggregate, Feedback
 
 
 @admin.register(Student)
@@ -88,11 +88,14 @@ class GymSessionAdmin(admin.ModelAdmin):
     
     def mark_as_active(self, request, queryset):
         """Admin action to mark sessions as active (remove check-out time)"""
-        updated = queryset.filter(is_active=False).update(
-            check_out_time=None, 
-            is_active=True, 
-            duration_minutes=0
-        )
+        # Saved one by one so the session signals refresh the daily stats
+        updated = 0
+        for session in queryset.filter(is_active=False):
+            session.check_out_time = None
+            session.is_active = True
+            session.duration_minutes = 0
+            session.save()
+            updated += 1
         self.message_user(
             request, 
             f"Successfully marked {updated} sessions as active."
@@ -124,6 +127,28 @@ class DailyGymStatsAdmin(admin.ModelAdmin):
         return super().get_queryset(request).select_related('student')
 
 
+@admin.register(StudentAggregate)
+class StudentAggregateAdmin(admin.ModelAdmin):
+    """
+    Admin interface for StudentAggregate model.
+    Read-only view of the materialized per-student gym totals.
+    """
+    list_display = [
+        'student', 'total_sessions', 'total_minutes', 'total_days',
+        'longest_streak', 'last_active_date', 'last_updated'
+    ]
+    search_fields = ['student__student_id', 'student__first_name', 'student__last_name']
+    ordering = ['-total_minutes']
+    readonly_fields = [
+        'student', 'total_sessions', 'total_minutes', 'total_days', 'longest_session',
+        'current_streak', 'longest_streak', 'last_active_date', 'last_updated'
+    ]
+    
+    def get_queryset(self, request):
+        """Optimize queryset with select_related for student"""
+        return super().get_queryset(request).select_related('student')
+
+
 # Customize admin site header and title
 admin.site.site_header = "APC Gym Log System Administration"
 admin.site.site_title = "APC Gym Log Admin"
@@ -12,6 +12,9 @@ class GymAppConfig(AppConfig):
     name = 'gym_app'
 
     def ready(self):
+        # Register cache invalidation signal handlers
+        from . import signals  # noqa: F401
+
         # Run once-per-process and only once per day to avoid repeated work
         try:
             from .maintenance import run_daily_maintenance
@@ -0,0 +1,122 @@
+"""
+Cache helpers for data derived from a student's gym history.
+
+Cached entries embed a per-student version number in their keys. Writes to
+a student's sessions or daily stats bump that version (see signals.py), so
+stale entries are simply never read again and expire on their own, without
+needing key scans for invalidation.
+
+Student lookups by student_id/rfid and the list of block sections are
+cached under plain keys and deleted explicitly whenever a student row changes.
+
+Invalidation only reaches other processes through a shared cache backend, so
+any deployment with more than one worker must set REDIS_URL (see settings).
+"""
+
+from datetime import datetime, time, timedelta
+import time as _time
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import Student
+
+
+STATS_CACHE_TIMEOUT = 900  # 15 minutes; writes invalidate through versioning
+STUDENT_LOOKUP_TIMEOUT = 300  # 5 minutes
+AVAILABLE_BLOCKS_TIMEOUT = 3600  # 1 hour
+
+AVAILABLE_BLOCKS_KEY = "gym:available_blocks"
+
+
+def _version_key(student_id):
+    return f"student:ver:{student_id}"
+
+
+def get_student_version(student_id):
+    """Return the current cache version for a student's derived data"""
+    return cache.get_or_set(_version_key(student_id), _time.time_ns, None)
+
+
+def bump_student_version(student_id):
+    """Invalidate every cached entry derived from a student's gym data"""
+    key = _version_key(student_id)
+    # Seed with a timestamp so an evicted version never restarts at a value
+    # that older cached entries were stored under
+    cache.add(key, _time.time_ns(), None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Evicted between add() and incr(); a fresh timestamp works as well
+        cache.set(key, _time.time_ns(), None)
+
+
+def heatmap_cache_key(student_id, start_date, end_date):
+    version = get_student_version(student_id)
+    return f"heatmap:{student_id}:{version}:{start_date.isoformat()}:{end_date.isoformat()}"
+
+
+def stats_cache_key(student_id, heatmap_range):
+    version = get_student_version(student_id)
+    return f"stats:{student_id}:{version}:{heatmap_range}"
+
+
+def seconds_until_midnight():
+    """Seconds until the next local midnight, when today's bucket closes"""
+    now = timezone.localtime()
+    midnight = datetime.combine(now.date() + timedelta(days=1), time.min, tzinfo=now.tzinfo)
+    return max(1, int((midnight - now).total_seconds()))
+
+
+def stats_cache_timeout():
+    """Stats streaks and windows are relative to today, so never outlive midnight"""
+    return min(STATS_CACHE_TIMEOUT, seconds_until_midnight())
+
+
+def student_lookup_key(field, value):
+    return f"student:{field}:{value}"
+
+
+def get_active_student_cached(value, field):
+    """
+    Resolve an active student by `field` ('student_id' or 'rfid').
+    Returns a dict with id/student_id/rfid, or None if no active student
+    matches. Only hits are cached: with the per-process cache, a student
+    registered or edited in another worker (or through queryset.update)
+    would otherwise keep being rejected until a cached miss expired.
+    """
+    key = student_lookup_key(field, value)
+    student = cache.get(key)
+    if student is None:
+        student = Student.objects.filter(
+            **{field: value, 'is_active': True}
+        ).values('id', 'student_id', 'rfid').first()
+        if student is not None:
+            cache.set(key, student, STUDENT_LOOKUP_TIMEOUT)
+    return student
+
+
+def invalidate_student_lookups(student_ids=(), rfids=()):
+    """Delete cached student lookups for the given student IDs and RFIDs"""
+    keys = [student_lookup_key('student_id', value) for value in student_ids if value]
+    keys += [student_lookup_key('rfid', value) for value in rfids if value]
+    if keys:
+        cache.delete_many(keys)
+
+
+def get_available_blocks_cached():
+    """Sorted block sections of active students"""
+    return cache.get_or_set(
+        AVAILABLE_BLOCKS_KEY,
+        lambda: list(
+            Student.objects.filter(is_active=True)
+            .values_list('block_section', flat=True)
+            .distinct()
+            .order_by('block_section')
+        ),
+        AVAILABLE_BLOCKS_TIMEOUT
+    )
+
+
+def invalidate_available_blocks():
+    cache.delete(AVAILABLE_BLOCKS_KEY)
@@ -4,9 +4,14 @@ from typing import Tuple
 from django.db import transaction
 from django.utils import timezone
 
+from .caching import bump_student_version
 from .models import GymSession, DailyGymStats
 
 
+# Days of daily stats recomputed from sessions by the daily maintenance
+RECENT_DAILY_STATS_DAYS = 7
+
+
 def _end_of_day(d) -> datetime:
     return datetime.combine(d, time(23, 59, 59, tzinfo=timezone.get_current_timezone()))
 
@@ -38,17 +43,18 @@ def close_stale_sessions_before_today() -> Tuple[int, int]:
             session.is_active = False
             session.save()
 
-            DailyGymStats.update_daily_stats(session.student, session.date)
-
             updated_sessions += 1
             updated_days.add((session.student_id, session.date))
 
+        DailyGymStats.bulk_update_daily_stats(updated_days)
+
     return updated_sessions, len(updated_days)
 
 
 def cap_sessions_on_previous_days_to_two_hours() -> Tuple[int, int]:
     updated_sessions = 0
     examined_sessions = 0
+    updated_days = set()
 
     today = timezone.now().date()
     max_duration = timedelta(hours=2)
@@ -80,14 +86,42 @@ def cap_sessions_on_previous_days_to_two_hours() -> Tuple[int, int]:
             session.is_active = False
             session.save()
 
-            DailyGymStats.update_daily_stats(session.student, session.date)
             updated_sessions += 1
+            updated_days.add((session.student_id, session.date))
+
+        DailyGymStats.bulk_update_daily_stats(updated_days)
 
     return examined_sessions, updated_sessions
 
 
+def recompute_recent_daily_stats(days: int = RECENT_DAILY_STATS_DAYS) -> int:
+    """
+    Recompute the daily stats of the last `days` days from the sessions, so an
+    update lost by a background worker doesn't leave a day wrong for good
+    """
+    since = timezone.now().date() - timedelta(days=days)
+
+    with transaction.atomic():
+        student_dates = set(GymSession.objects.filter(
+            date__gte=since,
+            check_out_time__isnull=False,
+        ).values_list("student_id", "date").distinct())
+        # Days whose sessions were all deleted still have a row to reset
+        student_dates |= set(DailyGymStats.objects.filter(
+            date__gte=since,
+        ).values_list("student_id", "date"))
+
+        DailyGymStats.bulk_update_daily_stats(student_dates)
+
+    # The bulk path bypasses the DailyGymStats signals
+    for student_id in {student_id for student_id, _ in student_dates}:
+        bump_student_version(student_id)
+    return len(student_dates)
+
+
 def run_daily_maintenance() -> None:
     close_stale_sessions_before_today()
     cap_sessions_on_previous_days_to_two_hours()
+    recompute_recent_daily_stats()
 
 
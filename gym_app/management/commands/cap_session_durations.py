@@ -26,6 +26,7 @@ class Command(BaseCommand):
         max_duration = timedelta(hours=2)
         updated_count = 0
         examined_count = 0
+        updated_days = set()
 
         sessions = GymSession.objects.all().order_by('check_in_time')
         if since_str:
@@ -76,10 +77,12 @@ class Command(BaseCommand):
                     session.duration_minutes = new_duration_minutes
                     session.is_active = False
                     session.save()
-                    # Update daily stats for that student/date
-                    DailyGymStats.update_daily_stats(session.student, session.date)
+                    # Daily stats for that student/date are rebuilt below in one batch
+                    updated_days.add((session.student_id, session.date))
                 updated_count += 1
 
+            DailyGymStats.bulk_update_daily_stats(updated_days)
+
         self.stdout.write(self.style.SUCCESS(
             f"Examined {examined_count} sessions. Updated {updated_count} overlong sessions." + (" (dry-run)" if dry_run else "")
         ))
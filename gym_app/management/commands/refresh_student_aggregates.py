@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from gym_app.maintenance import RECENT_DAILY_STATS_DAYS, recompute_recent_daily_stats
+from gym_app.models import Student, StudentAggregate
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute recent daily stats from sessions, then rebuild the materialized "
+        "per-student gym totals and streaks. Run nightly."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--student', type=str, default=None,
+            help='Only rebuild the aggregate for this student ID (e.g. 2023-123456).'
+        )
+        parser.add_argument(
+            '--days', type=int, default=RECENT_DAILY_STATS_DAYS,
+            help=f'Recompute daily stats for this many past days first (default {RECENT_DAILY_STATS_DAYS}; 0 to skip).'
+        )
+
+    def handle(self, *args, **options):
+        students = Student.objects.all()
+        if options['student']:
+            students = students.filter(student_id=options['student'])
+
+        recomputed = 0
+        if options['days'] > 0:
+            recomputed = recompute_recent_daily_stats(options['days'])
+
+        refreshed = 0
+        with transaction.atomic():
+            for student_pk in students.values_list('pk', flat=True).iterator():
+                StudentAggregate.refresh(student_pk)
+                refreshed += 1
+
+        today = timezone.now().date().isoformat()
+        self.stdout.write(self.style.SUCCESS(
+            f"[{today}] Recomputed {recomputed} daily stats rows and refreshed "
+            f"gym aggregates for {refreshed} students."
+        ))
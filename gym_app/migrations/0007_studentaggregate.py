@@ -0,0 +1,88 @@
+# Generated by Django 4.2.7 on 2026-10-15 22:58
+
+from datetime import timedelta
+from itertools import groupby
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_student_aggregates(apps, schema_editor):
+    """
+    Build an aggregate row for every existing student, the same way
+    StudentAggregate.refresh does: totals from completed sessions, active
+    days and streaks from daily stats.
+    """
+    Student = apps.get_model('gym_app', 'Student')
+    GymSession = apps.get_model('gym_app', 'GymSession')
+    DailyGymStats = apps.get_model('gym_app', 'DailyGymStats')
+    StudentAggregate = apps.get_model('gym_app', 'StudentAggregate')
+    
+    totals = {
+        row['student_id']: row
+        for row in GymSession.objects.filter(
+            check_out_time__isnull=False
+        ).values('student_id').annotate(
+            total_sessions=models.Count('id'),
+            total_minutes=models.Sum('duration_minutes'),
+            longest_session=models.Max('duration_minutes')
+        ).order_by()
+    }
+    active_dates = {
+        student_id: [date for _, date in rows]
+        for student_id, rows in groupby(
+            DailyGymStats.objects.filter(total_minutes__gt=0)
+            .order_by('student_id', 'date')
+            .values_list('student_id', 'date'),
+            key=lambda row: row[0]
+        )
+    }
+    
+    aggregates = []
+    for student_id in Student.objects.values_list('pk', flat=True).iterator():
+        row = totals.get(student_id, {})
+        dates = active_dates.get(student_id, [])
+        # Consecutive dates share the same (date - index) key
+        streaks = [
+            sum(1 for _ in group)
+            for _, group in groupby(enumerate(dates), key=lambda p: p[1] - timedelta(days=p[0]))
+        ]
+        aggregates.append(StudentAggregate(
+            student_id=student_id,
+            total_sessions=row.get('total_sessions', 0),
+            total_minutes=row.get('total_minutes') or 0,
+            total_days=len(dates),
+            longest_session=row.get('longest_session') or 0,
+            current_streak=streaks[-1] if streaks else 0,
+            longest_streak=max(streaks, default=0),
+            last_active_date=dates[-1] if dates else None,
+        ))
+    StudentAggregate.objects.bulk_create(aggregates, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gym_app', '0006_feedback'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentAggregate',
+            fields=[
+                ('student', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='aggregate', serialize=False, to='gym_app.student')),
+                ('total_sessions', models.PositiveIntegerField(default=0)),
+                ('total_minutes', models.PositiveIntegerField(default=0)),
+                ('total_days', models.PositiveIntegerField(default=0)),
+                ('longest_session', models.PositiveIntegerField(default=0)),
+                ('current_streak', models.PositiveIntegerField(default=0)),
+                ('longest_streak', models.PositiveIntegerField(default=0)),
+                ('last_active_date', models.DateField(blank=True, null=True)),
+                ('last_updated', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'gym_student_aggregates',
+            },
+        ),
+        migrations.RunPython(backfill_student_aggregates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-15 23:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gym_app', '0007_studentaggregate'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='gymsession',
+            name='gym_session_is_acti_0a1bad_idx',
+        ),
+        migrations.AddIndex(
+            model_name='gymsession',
+            index=models.Index(fields=['date'], name='gym_session_date_9c0ba9_idx'),
+        ),
+        # Serves every active-session lookup, per student
+        #   SELECT ... FROM gym_sessions WHERE student_id = ? AND is_active
+        # ("SEARCH gym_sessions USING INDEX idx_active_sessions (student_id=?)"),
+        # so there is no separate (student, is_active) index
+        migrations.AddIndex(
+            model_name='gymsession',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['student'], name='idx_active_sessions'),
+        ),
+    ]
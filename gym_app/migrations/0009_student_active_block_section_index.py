@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-15 23:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gym_app', '0008_gymsession_date_active_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['is_active', 'block_section'], name='gym_student_is_acti_7b13e9_idx'),
+        ),
+    ]
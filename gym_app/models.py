@@ -3,9 +3,14 @@ from django.core.validators import RegexValidator
 from django.utils import timezone
 from datetime import timedelta
 from datetime import datetime
+from itertools import groupby
 import re
 
 
+# Maximum gym time a student may log per day
+MAX_DAILY_MINUTES = 120  # 2 hours
+
+
 class Student(models.Model):
     """
     Model to store student information for gym registration.
@@ -65,6 +70,10 @@ class Student(models.Model):
     class Meta:
         db_table = 'gym_students'
         ordering = ['last_name', 'first_name']
+        indexes = [
+            # Lets the distinct active block sections come from the index alone
+            models.Index(fields=['is_active', 'block_section']),
+        ]
     
     def __str__(self):
         return f"{self.student_id} - {self.last_name}, {self.first_name}"
@@ -78,6 +87,16 @@ class Student(models.Model):
         self.clean()
         super().save(*args, **kwargs)
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Stored lookup values, so cached lookups under them can be cleared
+        # on save without re-reading the row (deferred fields are None)
+        instance._loaded_lookup_fields = (
+            instance.__dict__.get('student_id'), instance.__dict__.get('rfid')
+        )
+        return instance
+    
     @property
     def full_name(self):
         return f"{self.first_name} {self.last_name}"
@@ -89,13 +108,15 @@ class Student(models.Model):
     
     @property
     def total_gym_time_minutes(self):
-        """Returns total gym time in minutes across all sessions"""
-        sessions = self.gym_sessions.filter(check_out_time__isnull=False)
-        total_minutes = 0
-        for session in sessions:
-            duration = session.check_out_time - session.check_in_time
-            total_minutes += duration.total_seconds() / 60
-        return int(total_minutes)
+        """
+        Returns total gym time in minutes across all sessions, as the sum of
+        each session's whole minutes (the same figure as the daily stats and
+        PDF reports), rather than the minutes of the summed raw durations
+        """
+        total_minutes = self.gym_sessions.filter(
+            check_out_time__isnull=False
+        ).aggregate(total=models.Sum('duration_minutes'))['total']
+        return total_minutes or 0
 
 
 class GymSession(models.Model):
@@ -127,7 +148,15 @@ class GymSession(models.Model):
         ordering = ['-check_in_time']
         indexes = [
             models.Index(fields=['student', 'date']),
-            models.Index(fields=['is_active']),
+            models.Index(fields=['date']),
+            # Only the few open sessions; serves the per-student active-session
+            # lookup on every check-in/out, so no (student, is_active) index
+            # is needed (no query looks up a student's inactive sessions)
+            models.Index(
+                fields=['student'],
+                condition=models.Q(is_active=True),
+                name='idx_active_sessions',
+            ),
         ]
     
     def __str__(self):
@@ -160,14 +189,12 @@ class GymSession(models.Model):
         if date is None:
             date = timezone.now().date()
         
-        sessions = cls.objects.filter(
+        total_minutes = cls.objects.filter(
             student=student,
             date=date,
             check_out_time__isnull=False
-        )
-        
-        total_minutes = sum(session.duration_minutes for session in sessions)
-        return total_minutes
+        ).aggregate(total=models.Sum('duration_minutes'))['total']
+        return total_minutes or 0
     
     @classmethod
     def can_check_in(cls, student, date=None):
@@ -188,10 +215,43 @@ class GymSession(models.Model):
             return False, 0  # Already has active session
         
         daily_minutes = cls.get_daily_gym_time(student, date)
-        max_daily_minutes = 120  # 2 hours
-        remaining_minutes = max_daily_minutes - daily_minutes
-        
+        return cls.check_in_allowance(daily_minutes, has_active_session=False)
+    
+    @staticmethod
+    def check_in_allowance(daily_minutes, has_active_session):
+        """
+        Applies the 2-hour daily limit to already-known state.
+        Returns (can_check_in: bool, remaining_minutes: int)
+        """
+        if has_active_session:
+            return False, 0
+        remaining_minutes = MAX_DAILY_MINUTES - daily_minutes
         return remaining_minutes > 0, max(0, remaining_minutes)
+    
+    @classmethod
+    def get_daily_status(cls, student, date=None):
+        """
+        Returns (active_session, daily_minutes) for a student in one query,
+        where daily_minutes is the completed gym time on `date` (default today).
+        """
+        if date is None:
+            date = timezone.now().date()
+        
+        sessions = cls.objects.filter(
+            models.Q(is_active=True) | models.Q(date=date, check_out_time__isnull=False),
+            student=student
+        )
+        
+        active_session = None
+        daily_minutes = 0
+        for session in sessions:  # Newest first (Meta.ordering)
+            if session.is_active:
+                if active_session is None:
+                    active_session = session
+            elif session.date == date:
+                daily_minutes += session.duration_minutes
+        
+        return active_session, daily_minutes
 
 
 class DailyGymStats(models.Model):
@@ -226,25 +286,156 @@ class DailyGymStats(models.Model):
         Updates or creates daily stats for a student on a specific date.
         This should be called after each gym session completion.
         """
-        sessions = GymSession.objects.filter(
+        totals = GymSession.objects.filter(
             student=student,
             date=date,
             check_out_time__isnull=False
+        ).aggregate(
+            total_sessions=models.Count('id'),
+            total_minutes=models.Sum('duration_minutes')
         )
         
-        total_sessions = sessions.count()
-        total_minutes = sum(session.duration_minutes for session in sessions)
-        
         stats, created = cls.objects.update_or_create(
             student=student,
             date=date,
             defaults={
-                'total_sessions': total_sessions,
-                'total_minutes': total_minutes
+                'total_sessions': totals['total_sessions'],
+                'total_minutes': totals['total_minutes'] or 0
             }
         )
         
         return stats
+    
+    @classmethod
+    def bulk_update_daily_stats(cls, student_dates, batch_size=500):
+        """
+        Recomputes daily stats for many (student_id, date) pairs at once.
+        Aggregates the completed sessions in one query and upserts the rows
+        in batches instead of one update_or_create per pair. Bypasses the
+        DailyGymStats save signals, so callers must save the sessions first.
+        """
+        student_dates = set(student_dates)
+        if not student_dates:
+            return 0
+        
+        student_ids = {student_id for student_id, _ in student_dates}
+        dates = {date for _, date in student_dates}
+        totals = {
+            (row['student_id'], row['date']): row
+            for row in GymSession.objects.filter(
+                student_id__in=student_ids,
+                date__in=dates,
+                check_out_time__isnull=False
+            ).values('student_id', 'date').annotate(
+                total_sessions=models.Count('id'),
+                total_minutes=models.Sum('duration_minutes')
+            ).order_by()
+        }
+        
+        rows = []
+        for student_id, date in student_dates:
+            row = totals.get((student_id, date), {})
+            rows.append(cls(
+                student_id=student_id,
+                date=date,
+                total_sessions=row.get('total_sessions', 0),
+                total_minutes=row.get('total_minutes') or 0
+            ))
+        
+        cls.objects.bulk_create(
+            rows,
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=['student', 'date'],
+            update_fields=['total_sessions', 'total_minutes']
+        )
+        for student_id in student_ids:
+            StudentAggregate.refresh(student_id)
+        return len(rows)
+
+
+class StudentAggregate(models.Model):
+    """
+    Materialized per-student gym totals and streaks, so stats reads fetch a
+    single row instead of aggregating over the student's whole history.
+    Refreshed whenever the student's daily stats change (see signals.py) and
+    rebuilt in full by the refresh_student_aggregates management command.
+    """
+    
+    student = models.OneToOneField(
+        Student,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='aggregate'
+    )
+    total_sessions = models.PositiveIntegerField(default=0)
+    total_minutes = models.PositiveIntegerField(default=0)
+    total_days = models.PositiveIntegerField(default=0)
+    longest_session = models.PositiveIntegerField(default=0)
+    # Length of the run of consecutive active days ending on last_active_date
+    current_streak = models.PositiveIntegerField(default=0)
+    longest_streak = models.PositiveIntegerField(default=0)
+    last_active_date = models.DateField(null=True, blank=True)
+    last_updated = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'gym_student_aggregates'
+    
+    def __str__(self):
+        return f"{self.student_id} - {self.total_sessions} sessions ({self.total_minutes}min)"
+    
+    @property
+    def average_session_minutes(self):
+        """Average completed session length in minutes"""
+        if not self.total_sessions:
+            return 0
+        return self.total_minutes / self.total_sessions
+    
+    def current_streak_on(self, date):
+        """Current streak as of `date`; broken unless the student was active that day"""
+        return self.current_streak if self.last_active_date == date else 0
+    
+    @classmethod
+    def refresh(cls, student_id):
+        """Recomputes the aggregate row for a student from sessions and daily stats"""
+        totals = GymSession.objects.filter(
+            student_id=student_id,
+            check_out_time__isnull=False
+        ).aggregate(
+            total_sessions=models.Count('id'),
+            total_minutes=models.Sum('duration_minutes'),
+            longest_session=models.Max('duration_minutes')
+        )
+        dates = list(DailyGymStats.objects.filter(
+            student_id=student_id,
+            total_minutes__gt=0
+        ).order_by('date').values_list('date', flat=True))
+        
+        # Consecutive dates share the same (date - index) key
+        streaks = [
+            sum(1 for _ in group)
+            for _, group in groupby(enumerate(dates), key=lambda p: p[1] - timedelta(days=p[0]))
+        ]
+        
+        aggregate, created = cls.objects.update_or_create(
+            student_id=student_id,
+            defaults={
+                'total_sessions': totals['total_sessions'],
+                'total_minutes': totals['total_minutes'] or 0,
+                'total_days': len(dates),
+                'longest_session': totals['longest_session'] or 0,
+                'current_streak': streaks[-1] if streaks else 0,
+                'longest_streak': max(streaks, default=0),
+                'last_active_date': dates[-1] if dates else None,
+            }
+        )
+        return aggregate
+    
+    @classmethod
+    def for_student(cls, student):
+        """Returns the student's aggregate row, building it on first use"""
+        aggregate = cls.objects.filter(student=student).first()
+        return aggregate if aggregate is not None else cls.refresh(student.pk)
 
 
 class Feedback(models.Model):
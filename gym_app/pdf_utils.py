@@ -7,7 +7,7 @@ from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
 from reportlab.lib import colors
 from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak, Image
+from reportlab.platypus import BaseDocTemplate, PageTemplate, Frame, Paragraph, Spacer, Table, TableStyle, PageBreak, Image
 from reportlab.lib.utils import ImageReader
 from datetime import datetime, timedelta, date
 from django.http import HttpResponse
@@ -15,11 +15,52 @@ from django.utils import timezone
 from .models import Student, GymSession, DailyGymStats
 import io
 import base64
-from django.db.models import Q, Sum
+from django.db.models import Q, Sum, Count, Min, Max
 
 
+SYSTEM_TITLE = "APC Gym Log System"
+FOOTER_TEXT = f"Generated by {SYSTEM_TITLE}"
+GENERATION_TIME_FORMAT = "%B %d, %Y at %I:%M %p"
+DATE_FORMAT = "%m/%d/%Y"
+TIME_FORMAT = "%I:%M %p"
+
+
+class ReportDocTemplate(BaseDocTemplate):
+    """Single-frame A4 document that draws the footer directly on each page"""
+    
+    def __init__(self, filename, **kwargs):
+        kwargs.setdefault('pagesize', A4)
+        kwargs.setdefault('rightMargin', 72)
+        kwargs.setdefault('leftMargin', 72)
+        kwargs.setdefault('topMargin', 72)
+        kwargs.setdefault('bottomMargin', 36)
+        super().__init__(filename, **kwargs)
+        frame = Frame(self.leftMargin, self.bottomMargin, self.width, self.height, id='normal')
+        self.addPageTemplates([PageTemplate(id='main', frames=[frame], onPage=self._draw_footer)])
+    
+    def _draw_footer(self, canvas, doc):
+        page_width = doc.pagesize[0]
+        canvas.saveState()
+        canvas.setFont('Helvetica', 8)
+        canvas.setFillColor(colors.HexColor('#6b7280'))
+        canvas.drawCentredString(page_width / 2, 0.3 * inch, FOOTER_TEXT)
+        canvas.restoreState()
+
+
+def _format_duration(minutes):
+    """Format a duration in minutes as HH:MM (mirrors GymSession.session_duration_formatted)"""
+    if minutes:
+        return f"{minutes // 60:02d}:{minutes % 60:02d}"
+    return "00:00"
+
 class PDFReportGenerator:
-    """Generate PDF reports for gym data"""
+    """
+    Generate PDF reports for gym data.
+    
+    Each generate_* method accepts an optional writable `output` (e.g. an
+    HttpResponse); when omitted, the PDF is written to a new BytesIO that is
+    rewound and returned.
+    """
     
     def __init__(self):
         self.styles = getSampleStyleSheet()
@@ -42,11 +83,19 @@ class PDFReportGenerator:
         except Exception:
             return ""
 
-    def _format_date(self, dt: datetime, fmt: str = "%m/%d/%Y") -> str:
+    def _format_date(self, dt: datetime, fmt: str = DATE_FORMAT) -> str:
         return self._format_datetime(dt, fmt)
 
-    def _format_time(self, dt: datetime, fmt: str = "%I:%M %p") -> str:
+    def _format_time(self, dt: datetime, fmt: str = TIME_FORMAT) -> str:
         return self._format_datetime(dt, fmt)
+
+    # Type-specialized variants for table rows, where the caller already
+    # knows whether it holds an aware datetime or a plain date.
+    def _fmt_dt(self, dt: datetime, fmt: str) -> str:
+        return timezone.localtime(dt).strftime(fmt)
+
+    def _fmt_d(self, d: date, fmt: str = DATE_FORMAT) -> str:
+        return d.strftime(fmt)
     
     def setup_custom_styles(self):
         """Setup custom paragraph styles"""
@@ -88,14 +137,14 @@ class PDFReportGenerator:
     def create_header(self, story, title, subtitle=None):
         """Create document header"""
         # Title
-        story.append(Paragraph("APC Gym Log System", self.styles['CustomTitle']))
+        story.append(Paragraph(SYSTEM_TITLE, self.styles['CustomTitle']))
         story.append(Paragraph(title, self.styles['CustomHeading']))
         
         if subtitle:
             story.append(Paragraph(subtitle, self.styles['CustomSubHeading']))
         
-        # Generation info
-        generation_time = self._format_datetime(timezone.now(), "%B %d, %Y at %I:%M %p")
+        # Generation info (computed once per report)
+        generation_time = timezone.localtime().strftime(GENERATION_TIME_FORMAT)
         story.append(Paragraph(f"Generated on: {generation_time}", self.styles['Footer']))
         story.append(Spacer(1, 20))
     
@@ -107,7 +156,7 @@ class PDFReportGenerator:
         
         for student_data in students_data:
             last_session = student_data.get('last_session')
-            last_activity = self._format_date(last_session) if last_session else "No activity"
+            last_activity = self._fmt_d(last_session) if last_session else "No activity"
             
             row = [
                 student_data['student_id'],
@@ -141,19 +190,21 @@ class PDFReportGenerator:
         return table
     
     def create_session_details_table(self, sessions):
-        """Create detailed session table"""
+        """Create detailed session table from session value dicts"""
         headers = ['Date', 'Check In', 'Check Out', 'Duration', 'Status']
         data = [headers]
         
         for session in sessions:
-            check_out = self._format_time(session.check_out_time) if session.check_out_time else "Active"
-            status = "Completed" if session.check_out_time else "Active"
+            check_in_time = session['check_in_time']
+            check_out_time = session['check_out_time']
+            check_out = self._fmt_dt(check_out_time, TIME_FORMAT) if check_out_time else "Active"
+            status = "Completed" if check_out_time else "Active"
             
             row = [
-                self._format_date(session.check_in_time),
-                self._format_time(session.check_in_time),
+                self._fmt_dt(check_in_time, DATE_FORMAT),
+                self._fmt_dt(check_in_time, TIME_FORMAT),
                 check_out,
-                session.session_duration_formatted,
+                _format_duration(session['duration_minutes']),
                 status
             ]
             data.append(row)
@@ -178,10 +229,10 @@ class PDFReportGenerator:
         
         return table
     
-    def generate_user_report(self, student_id, date_from=None, date_to=None):
+    def generate_user_report(self, student_id, date_from=None, date_to=None, output=None):
         """Generate PDF report for a specific user"""
-        buffer = io.BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=72, leftMargin=72, topMargin=72, bottomMargin=18)
+        buffer = output if output is not None else io.BytesIO()
+        doc = ReportDocTemplate(buffer)
         story = []
         
         try:
@@ -195,8 +246,6 @@ class PDFReportGenerator:
             if date_to:
                 sessions_query = sessions_query.filter(check_in_time__date__lte=date_to)
             
-            sessions = sessions_query.order_by('-check_in_time')
-            
             # Create header
             date_range = ""
             if date_from or date_to:
@@ -225,9 +274,16 @@ class PDFReportGenerator:
             story.append(Paragraph(student_info, self.styles['Normal']))
             story.append(Spacer(1, 20))
             
-            # Statistics
-            total_sessions = sessions.filter(check_out_time__isnull=False).count()
-            total_minutes = sum(session.duration_minutes for session in sessions if session.duration_minutes)
+            # Statistics (single aggregate query over the filtered sessions)
+            completed = Q(check_out_time__isnull=False)
+            stats = sessions_query.aggregate(
+                total_completed=Count('id', filter=completed),
+                total_min=Sum('duration_minutes', filter=completed),
+                first_dt=Min('check_in_time'),
+                last_dt=Max('check_in_time'),
+            )
+            total_sessions = stats['total_completed']
+            total_minutes = stats['total_min'] or 0
             total_hours = total_minutes // 60
             remaining_minutes = total_minutes % 60
             
@@ -236,34 +292,36 @@ class PDFReportGenerator:
             <b>Total Completed Sessions:</b> {total_sessions}<br/>
             <b>Total Gym Time:</b> {total_hours}h {remaining_minutes}m ({total_minutes} minutes)<br/>
             <b>Average Session Duration:</b> {total_minutes // total_sessions if total_sessions > 0 else 0} minutes<br/>
-            <b>First Session:</b> {self._format_date(sessions.last().check_in_time, '%B %d, %Y') if sessions.exists() else 'No sessions'}<br/>
-            <b>Latest Session:</b> {self._format_date(sessions.first().check_in_time, '%B %d, %Y') if sessions.exists() else 'No sessions'}<br/>
+            <b>First Session:</b> {self._fmt_dt(stats['first_dt'], '%B %d, %Y') if stats['first_dt'] else 'No sessions'}<br/>
+            <b>Latest Session:</b> {self._fmt_dt(stats['last_dt'], '%B %d, %Y') if stats['last_dt'] else 'No sessions'}<br/>
             """
             story.append(Paragraph(stats_info, self.styles['Normal']))
             story.append(Spacer(1, 20))
             
             # Session Details
-            if sessions.exists():
+            sessions = list(
+                sessions_query.order_by('-check_in_time').values(
+                    'check_in_time', 'check_out_time', 'duration_minutes'
+                )
+            )
+            if sessions:
                 story.append(Paragraph("Session Details", self.styles['CustomHeading']))
                 story.append(self.create_session_details_table(sessions))
             else:
                 story.append(Paragraph("No sessions found for the specified criteria.", self.styles['Normal']))
             
-            # Footer
-            story.append(Spacer(1, 30))
-            story.append(Paragraph("Generated by APC Gym Log System", self.styles['Footer']))
-            
             doc.build(story)
-            buffer.seek(0)
+            if output is None:
+                buffer.seek(0)
             return buffer
             
         except Student.DoesNotExist:
             return None
     
-    def generate_daily_report(self, target_date):
+    def generate_daily_report(self, target_date, output=None):
         """Generate PDF report for all activity on a specific day"""
-        buffer = io.BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=72, leftMargin=72, topMargin=72, bottomMargin=18)
+        buffer = output if output is not None else io.BytesIO()
+        doc = ReportDocTemplate(buffer)
         story = []
         
         # Get all sessions for the date
@@ -276,11 +334,18 @@ class PDFReportGenerator:
             f"Date: {target_date.strftime('%A, %B %d, %Y')}"
         )
         
+        # Fetch the table rows once as plain tuples (no model or related
+        # Student hydration per row)
+        rows = list(sessions.values_list(
+            'student__student_id', 'student__first_name', 'student__last_name',
+            'check_in_time', 'check_out_time', 'duration_minutes'
+        ))
+        
         # Daily statistics
-        total_sessions = sessions.count()
+        total_sessions = len(rows)
         completed_sessions = sessions.filter(check_out_time__isnull=False).count()
         active_sessions = sessions.filter(is_active=True).count()
-        total_minutes = sum(session.duration_minutes for session in sessions if session.duration_minutes)
+        total_minutes = sum(row[5] for row in rows if row[5])
         unique_students = sessions.values('student').distinct().count()
         
         story.append(Paragraph("Daily Overview", self.styles['CustomHeading']))
@@ -294,23 +359,23 @@ class PDFReportGenerator:
         story.append(Paragraph(overview_info, self.styles['Normal']))
         story.append(Spacer(1, 20))
         
-        if sessions.exists():
+        if rows:
             # Session details table
             story.append(Paragraph("Session Details", self.styles['CustomHeading']))
             
             headers = ['Student ID', 'Student Name', 'Check In', 'Check Out', 'Duration', 'Status']
             data = [headers]
             
-            for session in sessions:
-                check_out = self._format_time(session.check_out_time) if session.check_out_time else "Active"
-                status = "Completed" if session.check_out_time else "Active"
+            for student_id, first_name, last_name, check_in_time, check_out_time, duration_minutes in rows:
+                check_out = self._fmt_dt(check_out_time, TIME_FORMAT) if check_out_time else "Active"
+                status = "Completed" if check_out_time else "Active"
                 
                 row = [
-                    session.student.student_id,
-                    session.student.full_name,
-                    self._format_time(session.check_in_time),
+                    student_id,
+                    f"{first_name} {last_name}",
+                    self._fmt_dt(check_in_time, TIME_FORMAT),
                     check_out,
-                    session.session_duration_formatted,
+                    _format_duration(duration_minutes),
                     status
                 ]
                 data.append(row)
@@ -337,24 +402,35 @@ class PDFReportGenerator:
         else:
             story.append(Paragraph("No gym activity recorded for this date.", self.styles['Normal']))
         
-        # Footer
-        story.append(Spacer(1, 30))
-        story.append(Paragraph("Generated by APC Gym Log System", self.styles['Footer']))
-        
         doc.build(story)
-        buffer.seek(0)
+        if output is None:
+            buffer.seek(0)
         return buffer
     
-    def generate_block_report(self, block_section, date_from=None, date_to=None):
+    def generate_block_report(self, block_section, date_from=None, date_to=None, output=None):
         """Generate PDF report for all students in a specific block/section"""
-        buffer = io.BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=72, leftMargin=72, topMargin=72, bottomMargin=18)
+        buffer = output if output is not None else io.BytesIO()
+        doc = ReportDocTemplate(buffer)
         story = []
         
-        # Get students from the block
-        students = Student.objects.filter(block_section__iexact=block_section, is_active=True)
+        # Build the session date filter once and aggregate every student's
+        # sessions in a single annotated query
+        date_q = Q()
+        if date_from:
+            date_q &= Q(gym_sessions__check_in_time__date__gte=date_from)
+        if date_to:
+            date_q &= Q(gym_sessions__check_in_time__date__lte=date_to)
+        completed_q = date_q & Q(gym_sessions__check_out_time__isnull=False)
+        
+        students = list(
+            Student.objects.filter(block_section__iexact=block_section, is_active=True).annotate(
+                total_sessions=Count('gym_sessions', filter=completed_q),
+                total_minutes=Sum('gym_sessions__duration_minutes', filter=completed_q),
+                last_check_in=Max('gym_sessions__check_in_time', filter=date_q),
+            )
+        )
         
-        if not students.exists():
+        if not students:
             return None
         
         # Create header
@@ -379,16 +455,9 @@ class PDFReportGenerator:
         total_block_minutes = 0
         
         for student in students:
-            sessions_query = GymSession.objects.filter(student=student)
-            if date_from:
-                sessions_query = sessions_query.filter(check_in_time__date__gte=date_from)
-            if date_to:
-                sessions_query = sessions_query.filter(check_in_time__date__lte=date_to)
-            
-            completed_sessions = sessions_query.filter(check_out_time__isnull=False)
-            total_sessions = completed_sessions.count()
-            total_minutes = sum(session.duration_minutes for session in completed_sessions if session.duration_minutes)
-            last_session = sessions_query.order_by('-check_in_time').first()
+            total_sessions = student.total_sessions
+            total_minutes = student.total_minutes or 0
+            last_session = student.last_check_in
             
             students_data.append({
                 'student_id': student.student_id,
@@ -396,12 +465,15 @@ class PDFReportGenerator:
                 'block_section': student.block_section,
                 'total_sessions': total_sessions,
                 'total_minutes': total_minutes,
-                'last_session': last_session.check_in_time.date() if last_session else None
+                'last_session': last_session.date() if last_session else None
             })
             
             total_block_sessions += total_sessions
             total_block_minutes += total_minutes
         
+        # Most active students first, then alphabetically
+        students_data.sort(key=lambda d: (-d['total_sessions'], d['full_name']))
+        
         # Block overview
         story.append(Paragraph("Block Overview", self.styles['CustomHeading']))
         overview_info = f"""
@@ -418,10 +490,7 @@ class PDFReportGenerator:
         story.append(Paragraph("Student Activity Summary", self.styles['CustomHeading']))
         story.append(self.create_student_summary_table(students_data))
         
-        # Footer
-        story.append(Spacer(1, 30))
-        story.append(Paragraph("Generated by APC Gym Log System", self.styles['Footer']))
-        
         doc.build(story)
-        buffer.seek(0)
+        if output is None:
+            buffer.seek(0)
         return buffer
@@ -1,8 +1,37 @@
 from rest_framework import serializers
-from .models import Student, GymSession, DailyGymStats, Feedback
+from .models import Student, GymSession, DailyGymStats, StudentAggregate, Feedback
+from .caching import (
+    heatmap_cache_key, stats_cache_key, seconds_until_midnight, stats_cache_timeout,
+    get_active_student_cached
+)
+from django.core.cache import cache
 from django.utils import timezone
+from django.db.models import Q, Case, When, Value, IntegerField
+from collections import OrderedDict
 from datetime import datetime, timedelta
 import re
+import threading
+
+
+# Precompiled patterns for registration validation
+_STUDENT_ID_RE = re.compile(r'^20\d{2}-\d{6}\Z')
+_WHITESPACE_RE = re.compile(r'\s+')
+
+# Heatmap intensity level thresholds (upper bound in minutes of levels 0-3):
+# Level 0: 0 minutes, Level 1: 1-30min, Level 2: 31-60min,
+# Level 3: 61-90min, Level 4: 91+ minutes
+HEATMAP_LEVEL_BOUNDS = (0, 30, 60, 90)
+# Heatmap windows selectable through the stats endpoints' `range` parameter.
+# 'ytd' (Jan 1 to today) matches the current-year calendar on the stats page.
+HEATMAP_RANGES = {'30d': 30, '90d': 90, '1y': 365, 'ytd': None}
+DEFAULT_HEATMAP_RANGE = 'ytd'
+HEATMAP_MAX_DAYS = 400
+HEATMAP_LEVEL_CASE = Case(
+    *[When(total_minutes__lte=bound, then=Value(level))
+      for level, bound in enumerate(HEATMAP_LEVEL_BOUNDS)],
+    default=Value(len(HEATMAP_LEVEL_BOUNDS)),
+    output_field=IntegerField()
+)
 
 
 class StudentRegistrationSerializer(serializers.ModelSerializer):
@@ -17,10 +46,16 @@ class StudentRegistrationSerializer(serializers.ModelSerializer):
             'student_id', 'first_name', 'last_name', 
             'pe_course', 'block_section', 'rfid'
         ]
+        # Uniqueness of student_id and rfid is checked in validate() with a
+        # single query instead of one UniqueValidator query per field
+        extra_kwargs = {
+            'student_id': {'validators': []},
+            'rfid': {'validators': []},
+        }
     
     def validate_student_id(self, value):
         """Validate student ID format"""
-        if not re.match(r'^20\d{2}-\d{6}$', value):
+        if not _STUDENT_ID_RE.match(value):
             raise serializers.ValidationError(
                 "Student ID must be in format 20xx-xxxxxx (e.g., 2023-123456)"
             )
@@ -29,37 +64,64 @@ class StudentRegistrationSerializer(serializers.ModelSerializer):
     def validate_block_section(self, value):
         """Remove spaces and convert to uppercase"""
         if value:
-            return re.sub(r'\s+', '', value.upper())
+            return _WHITESPACE_RE.sub('', value.upper())
         return value
     
     def validate_rfid(self, value):
         """Validate RFID field"""
         if not value or not value.strip():
             raise serializers.ValidationError("RFID is required for registration.")
-        
-        # Check if RFID already exists
-        if Student.objects.filter(rfid=value.strip()).exists():
-            raise serializers.ValidationError("This RFID is already registered to another student.")
-        
         return value.strip()
     
     def validate(self, data):
-        """Additional validation"""
-        # Check if student ID already exists
-        if Student.objects.filter(student_id=data['student_id']).exists():
-            raise serializers.ValidationError({
-                'student_id': 'A student with this ID is already registered.'
-            })
+        """Check student ID and RFID uniqueness in one query"""
+        student_id = data['student_id']
+        rfid = data.get('rfid')
+        
+        lookup = Q(student_id=student_id)
+        if rfid:
+            lookup |= Q(rfid=rfid)
+        
+        errors = {}
+        for existing_student_id, existing_rfid in Student.objects.filter(lookup).values_list('student_id', 'rfid'):
+            if existing_student_id == student_id:
+                errors['student_id'] = 'A student with this ID is already registered.'
+            if rfid and existing_rfid == rfid:
+                errors['rfid'] = 'This RFID is already registered to another student.'
+        
+        if errors:
+            raise serializers.ValidationError(errors)
         return data
+    
+    def to_representation(self, instance):
+        """Respond with the StudentSerializer shape; a new student has no gym time yet"""
+        return StudentSerializer(
+            instance, context={'gym_totals': {'sessions': 0, 'minutes': 0}}
+        ).data
+
+
+# Serialized students keyed by their field values (StudentSerializer.cached_data)
+STUDENT_DATA_CACHE_SIZE = 512
+_student_data_cache = OrderedDict()
+_student_data_lock = threading.Lock()
 
 
 class StudentSerializer(serializers.ModelSerializer):
     """
     Serializer for student data including computed fields.
+    Gym totals are read from a precomputed 'gym_totals' context dict or from
+    the student's StudentAggregate row when it was selected along with the
+    student (see prefetch_queryset), falling back to the model properties.
     """
     full_name = serializers.ReadOnlyField()
-    total_gym_sessions = serializers.ReadOnlyField()
-    total_gym_time_minutes = serializers.ReadOnlyField()
+    total_gym_sessions = serializers.SerializerMethodField()
+    total_gym_time_minutes = serializers.SerializerMethodField()
+    
+    # Stored fields the serialized output depends on (see cached_data)
+    CACHE_KEY_FIELDS = (
+        'student_id', 'first_name', 'last_name', 'pe_course', 'block_section',
+        'rfid', 'registration_date', 'is_active'
+    )
     
     class Meta:
         model = Student
@@ -69,11 +131,65 @@ class StudentSerializer(serializers.ModelSerializer):
             'total_gym_sessions', 'total_gym_time_minutes'
         ]
         read_only_fields = ['id', 'registration_date']
+    
+    @classmethod
+    def prefetch_queryset(cls, queryset):
+        """Join the materialized gym totals so serialization needs no extra queries"""
+        return queryset.select_related('aggregate')
+    
+    def _gym_total(self, obj, key):
+        totals = self.context.get('gym_totals')
+        if totals is not None:
+            return totals[key]
+        if not Student.aggregate.is_cached(obj):
+            return None
+        try:
+            aggregate = obj.aggregate
+        except StudentAggregate.DoesNotExist:
+            return None
+        return getattr(aggregate, f'total_{key}')
+    
+    def get_total_gym_sessions(self, obj):
+        count = self._gym_total(obj, 'sessions')
+        return obj.total_gym_sessions if count is None else count
+    
+    def get_total_gym_time_minutes(self, obj):
+        minutes = self._gym_total(obj, 'minutes')
+        return obj.total_gym_time_minutes if minutes is None else minutes
+    
+    @classmethod
+    def cached_data(cls, student, gym_totals=None):
+        """
+        Same as StudentSerializer(student).data, reused from a small
+        per-process LRU while the student's fields and totals are unchanged.
+        Meant for the kiosk tap path, where the same students repeat.
+        """
+        serializer = cls(student, context={'gym_totals': gym_totals} if gym_totals else {})
+        key = (
+            student.pk,
+            serializer.get_total_gym_sessions(student),
+            serializer.get_total_gym_time_minutes(student),
+        ) + tuple(getattr(student, field) for field in cls.CACHE_KEY_FIELDS)
+        
+        with _student_data_lock:
+            data = _student_data_cache.get(key)
+            if data is not None:
+                _student_data_cache.move_to_end(key)
+                return dict(data)
+        
+        data = dict(serializer.data)
+        with _student_data_lock:
+            _student_data_cache[key] = data
+            if len(_student_data_cache) > STUDENT_DATA_CACHE_SIZE:
+                _student_data_cache.popitem(last=False)
+        return dict(data)
 
 
 class GymSessionSerializer(serializers.ModelSerializer):
     """
     Serializer for gym sessions.
+    The nested student_info is only included when the serializer context has
+    include_student=True; by default sessions carry just the student's pk.
     """
     student_info = StudentSerializer(source='student', read_only=True)
     session_duration_formatted = serializers.ReadOnlyField()
@@ -85,6 +201,16 @@ class GymSessionSerializer(serializers.ModelSerializer):
             'duration_minutes', 'session_duration_formatted', 'date', 'is_active'
         ]
         read_only_fields = ['id', 'check_in_time', 'duration_minutes', 'date']
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if not self.context.get('include_student'):
+            self.fields.pop('student_info')
+    
+    @classmethod
+    def prefetch_queryset(cls, queryset):
+        """Join the student row so an included student_info needs no extra fetch"""
+        return queryset.select_related('student')
 
 
 class StudentLoginSerializer(serializers.Serializer):
@@ -95,9 +221,7 @@ class StudentLoginSerializer(serializers.Serializer):
     
     def validate_student_id(self, value):
         """Validate that student exists and is active"""
-        try:
-            student = Student.objects.get(student_id=value, is_active=True)
-        except Student.DoesNotExist:
+        if get_active_student_cached(value, 'student_id') is None:
             raise serializers.ValidationError(
                 "Student not found or account is inactive. Please register first."
             )
@@ -112,9 +236,7 @@ class StudentRFIDLoginSerializer(serializers.Serializer):
     
     def validate_rfid(self, value):
         """Validate that student exists and is active"""
-        try:
-            student = Student.objects.get(rfid=value.strip(), is_active=True)
-        except Student.DoesNotExist:
+        if get_active_student_cached(value.strip(), 'rfid') is None:
             raise serializers.ValidationError(
                 "RFID not recognized or account is inactive. Please check your RFID or register first."
             )
@@ -133,18 +255,17 @@ class CheckInOutSerializer(serializers.Serializer):
         student_id = data['student_id']
         action = data['action']
         
-        try:
-            student = Student.objects.get(student_id=student_id, is_active=True)
-        except Student.DoesNotExist:
+        student = Student.objects.filter(
+            student_id=student_id, is_active=True
+        ).first()
+        
+        if student is None:
             raise serializers.ValidationError({
                 'student_id': 'Student not found or account is inactive.'
             })
         
-        # Check for active session
-        active_session = GymSession.objects.filter(
-            student=student,
-            is_active=True
-        ).first()
+        # Active session and today's gym time in a single query
+        active_session, daily_minutes = GymSession.get_daily_status(student)
         
         if action == 'check_in':
             if active_session:
@@ -153,7 +274,9 @@ class CheckInOutSerializer(serializers.Serializer):
                 })
             
             # Check daily time limit
-            can_check_in, remaining_minutes = GymSession.can_check_in(student)
+            can_check_in, remaining_minutes = GymSession.check_in_allowance(
+                daily_minutes, has_active_session=False
+            )
             if not can_check_in:
                 raise serializers.ValidationError({
                     'action': f'Daily gym time limit reached (2 hours maximum). '
@@ -168,6 +291,7 @@ class CheckInOutSerializer(serializers.Serializer):
         
         data['student'] = student
         data['active_session'] = active_session
+        data['daily_minutes'] = daily_minutes
         return data
 
 
@@ -184,63 +308,85 @@ class DailyStatsSerializer(serializers.ModelSerializer):
 class HeatmapDataSerializer(serializers.Serializer):
     """
     Serializer for heatmap data (GitHub-style).
-    Returns data in format suitable for frontend heatmap visualization.
+    Returns data in a compact format for frontend heatmap visualization:
+    parallel counts/levels arrays covering consecutive workdays starting
+    at start_date.
     """
-    date = serializers.DateField()
-    count = serializers.IntegerField()
-    level = serializers.IntegerField()  # 0-4 intensity level
+    start_date = serializers.DateField()
+    dates_count = serializers.IntegerField()
+    counts = serializers.ListField(child=serializers.IntegerField())
+    levels = serializers.ListField(child=serializers.IntegerField())  # 0-4 intensity levels
+    
+    @staticmethod
+    def date_range(range_key=DEFAULT_HEATMAP_RANGE):
+        """
+        Resolve a HEATMAP_RANGES key to a (start_date, end_date) pair ending today.
+        Raises ValueError for unknown keys.
+        """
+        if range_key not in HEATMAP_RANGES:
+            raise ValueError(
+                f"Invalid range. Use one of: {', '.join(HEATMAP_RANGES)}"
+            )
+        end_date = timezone.now().date()
+        days = HEATMAP_RANGES[range_key]
+        if days is None:
+            return end_date.replace(month=1, day=1), end_date
+        return end_date - timedelta(days=days), end_date
     
     @staticmethod
     def generate_heatmap_data(student, start_date=None, end_date=None):
         """
         Generate heatmap data for a student.
-        Returns list of {date, count, level} for each day in the range.
-        Only includes workdays (Monday-Friday) with proper intensity levels.
+        Returns {start_date, dates_count, counts, levels}, where counts[i] and
+        levels[i] belong to the i-th workday (Monday-Friday) from start_date.
+        Ranges longer than HEATMAP_MAX_DAYS are clipped to the most recent days.
         """
         if end_date is None:
             end_date = timezone.now().date()
         if start_date is None:
             start_date = end_date - timedelta(days=365)  # Last year
+        if (end_date - start_date).days > HEATMAP_MAX_DAYS:
+            start_date = end_date - timedelta(days=HEATMAP_MAX_DAYS)
+        
+        # Past days never change, so cache until midnight when today's bucket closes
+        cache_key = heatmap_cache_key(student.id, start_date, end_date)
+        heatmap_data = cache.get(cache_key)
+        if heatmap_data is not None:
+            return heatmap_data
         
-        # Get all daily stats for the student in the date range
+        # Get all daily stats for the student in the date range, with the
+        # intensity level computed by the database
         stats = DailyGymStats.objects.filter(
             student=student,
             date__range=[start_date, end_date]
-        ).values('date', 'total_minutes')
+        ).annotate(
+            level=HEATMAP_LEVEL_CASE
+        ).values_list('date', 'total_minutes', 'level').iterator(chunk_size=500)
         
-        # Create a dictionary for quick lookup
-        stats_dict = {stat['date']: stat['total_minutes'] for stat in stats}
+        # Build the lookup in one streamed pass; days without a row are empty
+        stats_dict = {day: (minutes, level) for day, minutes, level in stats}
+        get_stats = stats_dict.get
         
-        # Determine intensity levels based on minutes
-        # Level 0: 0 minutes, Level 1: 1-30min, Level 2: 31-60min, 
-        # Level 3: 61-90min, Level 4: 91+ minutes
-        def get_intensity_level(minutes):
-            if minutes == 0:
-                return 0
-            elif minutes <= 30:
-                return 1
-            elif minutes <= 60:
-                return 2
-            elif minutes <= 90:
-                return 3
-            else:
-                return 4
-        
-        # Generate data for each workday in the range (Monday-Friday)
-        heatmap_data = []
-        current_date = start_date
+        # Only include workdays in the range (Monday=0 ... Friday=4)
+        start_weekday = start_date.weekday()
+        total_days = (end_date - start_date).days + 1
+        workdays = [
+            start_date + timedelta(days=offset)
+            for offset in range(total_days)
+            if (start_weekday + offset) % 7 < 5
+        ]
         
-        while current_date <= end_date:
-            # Only include workdays (Monday=0, Friday=4)
-            if current_date.weekday() < 5:  # Monday to Friday
-                minutes = stats_dict.get(current_date, 0)
-                heatmap_data.append({
-                    'date': current_date,
-                    'count': minutes,
-                    'level': get_intensity_level(minutes)
-                })
-            current_date += timedelta(days=1)
+        # Plain str/int/list values only: views return this dict as-is, so
+        # JSONRenderer encodes it directly without per-field serialization
+        day_stats = [get_stats(day, (0, 0)) for day in workdays]
+        heatmap_data = {
+            'start_date': (workdays[0] if workdays else start_date).isoformat(),
+            'dates_count': len(day_stats),
+            'counts': [minutes for minutes, _ in day_stats],
+            'levels': [level for _, level in day_stats],
+        }
         
+        cache.set(cache_key, heatmap_data, seconds_until_midnight())
         return heatmap_data
 
 
@@ -249,7 +395,7 @@ class StudentStatsSerializer(serializers.Serializer):
     Comprehensive serializer for student statistics.
     """
     student_info = StudentSerializer(read_only=True)
-    heatmap_data = serializers.ListField(child=HeatmapDataSerializer(), read_only=True)
+    heatmap_data = HeatmapDataSerializer(read_only=True)
     total_days_active = serializers.IntegerField(read_only=True)
     average_session_duration = serializers.IntegerField(read_only=True)
     longest_session_minutes = serializers.IntegerField(read_only=True)
@@ -257,74 +403,41 @@ class StudentStatsSerializer(serializers.Serializer):
     longest_streak = serializers.IntegerField(read_only=True)
     
     @staticmethod
-    def get_student_stats(student):
+    def get_student_stats(student, heatmap_range=DEFAULT_HEATMAP_RANGE):
         """
-        Calculate comprehensive statistics for a student.
+        Return comprehensive statistics for a student, cached for a few
+        minutes and invalidated whenever the student's gym data changes.
         """
-        # Get all completed sessions
-        sessions = GymSession.objects.filter(
-            student=student,
-            check_out_time__isnull=False
-        ).order_by('date')
-        
-        if not sessions.exists():
-            return {
-                'student_info': StudentSerializer(student).data,
-                'heatmap_data': HeatmapDataSerializer.generate_heatmap_data(student),
-                'total_days_active': 0,
-                'average_session_duration': 0,
-                'longest_session_minutes': 0,
-                'current_streak': 0,
-                'longest_streak': 0
-            }
-        
-        # Calculate statistics
-        total_days_active = sessions.values('date').distinct().count()
-        from django.db.models import Avg, Max
-        average_duration = sessions.aggregate(
-            avg=Avg('duration_minutes')
-        )['avg'] or 0
-        longest_session = sessions.aggregate(
-            max=Max('duration_minutes')
-        )['max'] or 0
-        
-        # Calculate streaks (consecutive days with gym activity)
-        daily_stats = DailyGymStats.objects.filter(
-            student=student,
-            total_minutes__gt=0
-        ).order_by('date')
-        
-        current_streak = 0
-        longest_streak = 0
-        temp_streak = 0
-        
-        if daily_stats.exists():
-            dates = [stat.date for stat in daily_stats]
-            today = timezone.now().date()
-            
-            # Calculate current streak
-            for i in range(len(dates) - 1, -1, -1):
-                if dates[i] == today - timedelta(days=len(dates) - 1 - i):
-                    current_streak += 1
-                else:
-                    break
-            
-            # Calculate longest streak
-            for i in range(len(dates)):
-                if i == 0 or dates[i] == dates[i-1] + timedelta(days=1):
-                    temp_streak += 1
-                    longest_streak = max(longest_streak, temp_streak)
-                else:
-                    temp_streak = 1
+        cache_key = stats_cache_key(student.id, heatmap_range)
+        stats_data = cache.get(cache_key)
+        if stats_data is None:
+            stats_data = StudentStatsSerializer.compute_student_stats(student, heatmap_range)
+            cache.set(cache_key, stats_data, stats_cache_timeout())
+        return stats_data
+    
+    @staticmethod
+    def compute_student_stats(student, heatmap_range=DEFAULT_HEATMAP_RANGE):
+        """
+        Calculate comprehensive statistics for a student, with heatmap data
+        for the given HEATMAP_RANGES window.
+        """
+        # Totals and streaks come from the materialized aggregate row
+        aggregate = StudentAggregate.for_student(student)
+        gym_totals = {
+            'sessions': aggregate.total_sessions,
+            'minutes': aggregate.total_minutes,
+        }
         
         return {
-            'student_info': StudentSerializer(student).data,
-            'heatmap_data': HeatmapDataSerializer.generate_heatmap_data(student),
-            'total_days_active': total_days_active,
-            'average_session_duration': int(round(average_duration)),
-            'longest_session_minutes': longest_session,
-            'current_streak': current_streak,
-            'longest_streak': longest_streak
+            'student_info': StudentSerializer(student, context={'gym_totals': gym_totals}).data,
+            'heatmap_data': HeatmapDataSerializer.generate_heatmap_data(
+                student, *HeatmapDataSerializer.date_range(heatmap_range)
+            ),
+            'total_days_active': aggregate.total_days,
+            'average_session_duration': int(round(aggregate.average_session_minutes)),
+            'longest_session_minutes': aggregate.longest_session,
+            'current_streak': aggregate.current_streak_on(timezone.now().date()),
+            'longest_streak': aggregate.longest_streak
         }
 
 
@@ -0,0 +1,90 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .caching import bump_student_version, invalidate_student_lookups, invalidate_available_blocks
+from .models import Student, GymSession, DailyGymStats, StudentAggregate
+from .tasks import schedule_daily_stats_update, schedule_stats_recompute
+
+
+def _deleting_student(origin):
+    """True if a delete cascaded from a student (an instance or a queryset)"""
+    return getattr(origin, 'model', type(origin)) is Student
+
+
+@receiver(post_save, sender=GymSession)
+@receiver(post_delete, sender=GymSession)
+@receiver(post_save, sender=DailyGymStats)
+@receiver(post_delete, sender=DailyGymStats)
+def invalidate_student_gym_cache(sender, instance, **kwargs):
+    """Drop cached heatmap/stats whenever a student's gym data changes"""
+    bump_student_version(instance.student_id)
+    # Bump again once the write is visible, so stats computed by a concurrent
+    # request from pre-commit data are not served under the new version
+    transaction.on_commit(lambda: bump_student_version(instance.student_id))
+
+
+@receiver(post_save, sender=DailyGymStats)
+@receiver(post_delete, sender=DailyGymStats)
+def refresh_student_aggregate(sender, instance, origin=None, **kwargs):
+    """Keep the materialized per-student totals in step with daily stats"""
+    if _deleting_student(origin):
+        # The student is being deleted; its aggregate row goes with it
+        return
+    StudentAggregate.refresh(instance.student_id)
+
+
+@receiver(post_save, sender=GymSession)
+@receiver(post_delete, sender=GymSession)
+def refresh_session_daily_stats(sender, instance, created=False, origin=None, **kwargs):
+    """
+    Recompute the session's daily stats (and with them the aggregate row) for
+    every session change, including admin edits, actions and deletes
+    """
+    if _deleting_student(origin):
+        return
+    if created and instance.is_active:
+        # A check-in adds no completed time
+        return
+    schedule_daily_stats_update(instance.student_id, instance.date)
+
+
+@receiver(post_save, sender=GymSession)
+def refresh_student_stats(sender, instance, **kwargs):
+    """Warm the stats cache in the background so dashboard loads stay cheap"""
+    schedule_stats_recompute(instance.student_id)
+
+
+@receiver(post_save, sender=Student)
+def create_student_aggregate(sender, instance, created, raw=False, **kwargs):
+    """New students start with an empty aggregate row so reads never fall back"""
+    if created and not raw:
+        StudentAggregate.objects.create(student=instance)
+
+
+@receiver(post_save, sender=Student)
+def invalidate_student_profile_cache(sender, instance, **kwargs):
+    """Cached stats embed the serialized student, so profile edits bump it too"""
+    bump_student_version(instance.pk)
+
+
+@receiver(post_save, sender=Student)
+@receiver(post_delete, sender=Student)
+def invalidate_student_lookup_cache(sender, instance, **kwargs):
+    """Drop cached student_id/rfid lookups, under both the stored and new values"""
+    student_ids = [instance.student_id]
+    rfids = [instance.rfid]
+    # Values as loaded from the database (see Student.from_db)
+    loaded = getattr(instance, '_loaded_lookup_fields', None)
+    if loaded:
+        student_ids.append(loaded[0])
+        rfids.append(loaded[1])
+    invalidate_student_lookups(student_ids, rfids)
+    instance._loaded_lookup_fields = (instance.student_id, instance.rfid)
+
+
+@receiver(post_save, sender=Student)
+@receiver(post_delete, sender=Student)
+def invalidate_available_blocks_cache(sender, instance, **kwargs):
+    """Block sections or active flags may have changed"""
+    invalidate_available_blocks()
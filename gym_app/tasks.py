@@ -0,0 +1,131 @@
+"""
+Background work that is kept off the request path.
+
+Jobs run on a small in-process thread pool after the surrounding
+transaction commits. Results land in the shared cache, so request handlers
+only read them and fall back to computing synchronously on a miss.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import json
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import OperationalError, connections, transaction
+
+from .caching import bump_student_version, stats_cache_key, stats_cache_timeout
+from .models import Student, DailyGymStats
+from .serializers import StudentStatsSerializer, DEFAULT_HEATMAP_RANGE
+
+
+logger = logging.getLogger(__name__)
+
+STATS_RECOMPUTE_DEBOUNCE = 30  # seconds
+# Attempts for a background daily stats update, e.g. while SQLite is locked
+# by concurrent check-outs; anything still missed is recomputed by the daily
+# maintenance (see maintenance.recompute_recent_daily_stats)
+DAILY_STATS_ATTEMPTS = 3
+DAILY_STATS_RETRY_DELAY = 0.5  # seconds, multiplied by the attempt number
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='gymlog-tasks')
+# Single worker so appended lines keep their submission order
+_file_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='gymlog-files')
+
+
+def _recompute_lock_key(student_id):
+    return f"stats:recompute:{student_id}"
+
+
+def recompute_student_stats(student_id):
+    """Compute a student's stats and store them under the current cache key"""
+    try:
+        # Let changes made while this job was queued schedule a fresh run
+        cache.delete(_recompute_lock_key(student_id))
+        student = Student.objects.filter(pk=student_id).first()
+        if student is None:
+            return
+        cache_key = stats_cache_key(student_id, DEFAULT_HEATMAP_RANGE)
+        if cache.get(cache_key) is None:
+            stats_data = StudentStatsSerializer.compute_student_stats(student)
+            cache.set(cache_key, stats_data, stats_cache_timeout())
+    except Exception:
+        logger.exception("Failed to recompute stats for student %s", student_id)
+    finally:
+        # Worker threads get their own connections; don't leave them open
+        connections.close_all()
+
+
+def schedule_stats_recompute(student_id):
+    """
+    Queue a stats refresh for a student once the current transaction commits.
+    Bursts of writes for the same student collapse into a single job.
+    """
+    if not getattr(settings, 'GYM_STATS_BACKGROUND_REFRESH', True):
+        return
+    if not cache.add(_recompute_lock_key(student_id), True, STATS_RECOMPUTE_DEBOUNCE):
+        return
+    transaction.on_commit(
+        lambda: _executor.submit(recompute_student_stats, student_id)
+    )
+
+
+def refresh_daily_stats(student_id, date):
+    """Recompute a student's daily stats row and aggregate, then drop cached stats"""
+    # The bulk path bypasses the DailyGymStats signals, so bump explicitly
+    DailyGymStats.bulk_update_daily_stats([(student_id, date)])
+    bump_student_version(student_id)
+
+
+def update_daily_stats(student_id, date):
+    """Recompute a student's daily stats row, then refresh their cached stats"""
+    try:
+        if not Student.objects.filter(pk=student_id).exists():
+            return
+        for attempt in range(1, DAILY_STATS_ATTEMPTS + 1):
+            try:
+                refresh_daily_stats(student_id, date)
+                break
+            except OperationalError:
+                if attempt == DAILY_STATS_ATTEMPTS:
+                    raise
+                logger.warning(
+                    "Retrying daily stats update for student %s on %s",
+                    student_id, date, exc_info=True
+                )
+                time.sleep(DAILY_STATS_RETRY_DELAY * attempt)
+        schedule_stats_recompute(student_id)
+    except Exception:
+        logger.exception(
+            "Failed to update daily stats for student %s on %s", student_id, date
+        )
+    finally:
+        connections.close_all()
+
+
+def schedule_daily_stats_update(student_id, date):
+    """
+    Queue the daily stats bookkeeping for a changed session once the current
+    transaction commits. Runs inline when background refresh is disabled.
+    """
+    if not getattr(settings, 'GYM_STATS_BACKGROUND_REFRESH', True):
+        refresh_daily_stats(student_id, date)
+        return
+    transaction.on_commit(
+        lambda: _executor.submit(update_daily_stats, student_id, date)
+    )
+
+
+def _append_jsonl(path, record):
+    try:
+        path.parent.mkdir(exist_ok=True)
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+    except Exception:
+        logger.exception("Failed to append to %s", path)
+
+
+def append_jsonl(path, record):
+    """Append `record` as one JSON line to `path` in the background"""
+    _file_executor.submit(_append_jsonl, path, record)
@@ -1,3 +1,137 @@
-from django.test import TestCase
+from datetime import timedelta
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .caching import get_active_student_cached
+from .maintenance import recompute_recent_daily_stats
+from .models import Student, GymSession, DailyGymStats, StudentAggregate
+
+
+@override_settings(GYM_STATS_BACKGROUND_REFRESH=False)
+class SessionStatsTests(TestCase):
+    """Stats served from the aggregate row follow every change to a session"""
+
+    def setUp(self):
+        cache.clear()
+        self.student = Student.objects.create(
+            student_id='2023-100001',
+            first_name='Test',
+            last_name='Student',
+            block_section='STEM241',
+        )
+        check_in = timezone.now() - timedelta(hours=1)
+        self.session = GymSession.objects.create(
+            student=self.student,
+            check_in_time=check_in,
+            check_out_time=check_in + timedelta(minutes=30),
+            date=timezone.localdate(check_in),
+        )
+
+    def get_stats(self):
+        response = self.client.get(f'/api/stats/{self.student.student_id}/')
+        self.assertEqual(response.status_code, 200)
+        return response.json()['data']
+
+    def assert_totals(self, sessions, minutes, days):
+        stats = self.get_stats()
+        self.assertEqual(stats['student_info']['total_gym_sessions'], sessions)
+        self.assertEqual(stats['student_info']['total_gym_time_minutes'], minutes)
+        self.assertEqual(stats['total_days_active'], days)
+
+    def test_completed_session_is_counted(self):
+        self.assert_totals(1, 30, 1)
+
+    def test_deleted_session_is_removed_from_stats(self):
+        self.assert_totals(1, 30, 1)
+        GymSession.objects.all().delete()
+        self.assert_totals(0, 0, 0)
+
+    def test_edited_session_updates_stats(self):
+        self.assert_totals(1, 30, 1)
+        self.session.check_out_time = self.session.check_in_time + timedelta(minutes=45)
+        self.session.save()
+        self.assert_totals(1, 45, 1)
+
+
+@override_settings(GYM_STATS_BACKGROUND_REFRESH=False)
+class TotalGymTimeTests(TestCase):
+    """Total gym time adds up whole minutes per session, like the PDF reports"""
+
+    def test_total_sums_truncated_session_minutes(self):
+        cache.clear()
+        student = Student.objects.create(
+            student_id='2023-100002',
+            first_name='Test',
+            last_name='Student',
+            block_section='STEM241',
+        )
+        check_in = timezone.now() - timedelta(hours=2)
+        for duration in (timedelta(minutes=30, seconds=50), timedelta(minutes=10, seconds=20)):
+            GymSession.objects.create(
+                student=student,
+                check_in_time=check_in,
+                check_out_time=check_in + duration,
+                date=timezone.localdate(check_in),
+            )
+            check_in += timedelta(minutes=45)
+
+        # 30 + 10, not int(41.17) from the summed raw durations
+        self.assertEqual(student.total_gym_time_minutes, 40)
+        response = self.client.get(f'/api/stats/{student.student_id}/')
+        self.assertEqual(response.json()['data']['student_info']['total_gym_time_minutes'], 40)
+
+
+class StudentLookupCacheTests(TestCase):
+    """Cached student lookups never hide students from other writers"""
+
+    def test_miss_is_not_cached(self):
+        cache.clear()
+        student = Student.objects.create(
+            student_id='2023-100003',
+            first_name='Test',
+            last_name='Student',
+            block_section='STEM241',
+        )
+        self.assertIsNone(get_active_student_cached('RFID-NEW', 'rfid'))
+        # queryset.update sends no signals, so nothing would clear a cached miss
+        Student.objects.filter(pk=student.pk).update(rfid='RFID-NEW')
+        self.assertEqual(get_active_student_cached('RFID-NEW', 'rfid')['id'], student.pk)
+
+
+class RFIDValidationTests(TestCase):
+    """Malformed RFID request bodies are rejected with a 400, never a 500"""
+
+    def test_non_object_body_is_rejected(self):
+        for body in (['123'], '123', 123):
+            for url in ('/api/login/', '/api/stats/rfid/'):
+                response = self.client.post(url, body, content_type='application/json')
+                self.assertEqual(response.status_code, 400, (url, body))
+
+
+@override_settings(GYM_STATS_BACKGROUND_REFRESH=True)
+class RecentDailyStatsTests(TestCase):
+    """Daily maintenance repairs daily stats a background update never wrote"""
+
+    def test_lost_update_is_recomputed(self):
+        student = Student.objects.create(
+            student_id='2023-100004',
+            first_name='Test',
+            last_name='Student',
+            block_section='STEM241',
+        )
+        check_in = timezone.now() - timedelta(hours=1)
+        # TestCase never commits, so the queued background update never runs
+        GymSession.objects.create(
+            student=student,
+            check_in_time=check_in,
+            check_out_time=check_in + timedelta(minutes=30),
+            date=timezone.localdate(check_in),
+        )
+        self.assertFalse(DailyGymStats.objects.filter(student=student).exists())
+
+        recompute_recent_daily_stats()
+        stats = DailyGymStats.objects.get(student=student)
+        self.assertEqual((stats.total_sessions, stats.total_minutes), (1, 30))
+        self.assertEqual(StudentAggregate.objects.get(student=student).total_minutes, 30)
@@ -1,22 +1,64 @@
 from rest_framework import status, generics
 from rest_framework.decorators import api_view
+from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from django.shortcuts import get_object_or_404
 from django.utils import timezone
 from django.db import transaction
 from django.http import HttpResponse
-from datetime import datetime, date
-from .models import Student, GymSession, DailyGymStats, Feedback
+from datetime import date
+from .models import Student, GymSession, Feedback
 from .serializers import (
     StudentRegistrationSerializer, StudentSerializer, GymSessionSerializer,
     StudentLoginSerializer, StudentRFIDLoginSerializer, CheckInOutSerializer, 
-    StudentStatsSerializer, HeatmapDataSerializer, FeedbackSerializer
+    StudentStatsSerializer, HeatmapDataSerializer, FeedbackSerializer,
+    HEATMAP_RANGES, DEFAULT_HEATMAP_RANGE
 )
 from .pdf_utils import PDFReportGenerator
+from .caching import get_available_blocks_cached
+from .tasks import append_jsonl
 from django.conf import settings
-import json
+from collections.abc import Mapping
 from pathlib import Path
+import logging
+import re
+
+
+logger = logging.getLogger(__name__)
+
+# Tags are stored as free-form strings (mostly 10-digit card numbers), so
+# only reject empty, oversized or control-character input up front
+_RFID_RE = re.compile(r'^[^\x00-\x1f\x7f]{1,50}\Z')
+
+
+def student_not_found_response():
+    """JSON 404 for lookups of unknown or inactive students"""
+    return Response({
+        'success': False,
+        'message': 'Student not found or account is inactive',
+        'errors': {}
+    }, status=status.HTTP_404_NOT_FOUND)
+
+
+def parse_rfid(data):
+    """Stripped RFID from request data, or None if it isn't a plausible tag"""
+    # JSON bodies may be arrays or scalars; those carry no RFID
+    if not isinstance(data, Mapping):
+        return None
+    value = data.get('rfid')
+    if isinstance(value, bool) or not isinstance(value, (str, int)):
+        return None
+    value = str(value).strip()
+    return value if _RFID_RE.match(value) else None
+
+
+def rfid_rejected_response(error):
+    """JSON 400 for RFID taps that are malformed or match no active student"""
+    return Response({
+        'success': False,
+        'message': 'RFID not recognized. Please check your RFID or register first.',
+        'errors': {'rfid': [error]}
+    }, status=status.HTTP_400_BAD_REQUEST)
 
 
 class StudentRegistrationView(APIView):
@@ -30,12 +72,11 @@ class StudentRegistrationView(APIView):
         serializer = StudentRegistrationSerializer(data=request.data)
         
         if serializer.is_valid():
-            student = serializer.save()
-            response_data = StudentSerializer(student).data
+            serializer.save()
             return Response({
                 'success': True,
                 'message': 'Student registered successfully!',
-                'data': response_data
+                'data': serializer.data
             }, status=status.HTTP_201_CREATED)
         
         return Response({
@@ -53,36 +94,56 @@ class StudentLoginView(APIView):
     
     def post(self, request):
         """Login student using RFID"""
-        serializer = StudentRFIDLoginSerializer(data=request.data)
+        # A tap is a single field; check its format without a serializer
+        rfid = parse_rfid(request.data)
+        if rfid is None:
+            return rfid_rejected_response('Enter a valid RFID.')
         
-        if serializer.is_valid():
-            rfid = serializer.validated_data['rfid']
-            student = get_object_or_404(Student, rfid=rfid, is_active=True)
+        with transaction.atomic():
+            # Lock the student row so concurrent taps of the same card
+            # are applied one after another (no duplicate active sessions)
+            student = StudentSerializer.prefetch_queryset(
+                Student.objects.select_for_update(of=('self',))
+            ).filter(rfid=rfid, is_active=True).first()
+            if student is None:
+                return rfid_rejected_response(
+                    'RFID not recognized or account is inactive. '
+                    'Please check your RFID or register first.'
+                )
             
-            # Check if student has an active session
-            active_session = GymSession.objects.filter(
-                student=student,
-                is_active=True
-            ).first()
+            # One timestamp for the whole tap so the time and its date agree
+            now = timezone.now()
+            today = now.date()
             
-            # Get daily gym time
-            daily_minutes = GymSession.get_daily_gym_time(student)
-            can_check_in, remaining_minutes = GymSession.can_check_in(student)
+            # Active session and today's gym time in a single query
+            active_session, daily_minutes = GymSession.get_daily_status(student, today)
+            can_check_in, remaining_minutes = GymSession.check_in_allowance(
+                daily_minutes, active_session is not None
+            )
             
             # RFID Tap Logic: Auto check-in/check-out
             checked_out_session = None
+            gym_totals = None
             if active_session:
                 # Student has active session - CHECK OUT
-                active_session.check_out_time = timezone.now()
+                active_session.check_out_time = now
                 active_session.save()
-                
+            
                 # Store the completed session data before it becomes inactive
                 checked_out_session = active_session
-                
-                # Update daily stats
-                DailyGymStats.update_daily_stats(student, active_session.date)
-                
-                message = f'Checked out successfully! Session duration: {active_session.session_duration_formatted}'
+            
+                # Daily stats and the aggregate row are updated by the session
+                # signals; fold this session into the loaded totals for the response
+                if Student.aggregate.is_cached(student):
+                    gym_totals = {
+                        'sessions': student.aggregate.total_sessions + 1,
+                        'minutes': student.aggregate.total_minutes + active_session.duration_minutes,
+                    }
+            
+                if active_session.date == today:
+                    daily_minutes += active_session.duration_minutes
+                active_session = None
+                message = f'Checked out successfully! Session duration: {checked_out_session.session_duration_formatted}'
                 session_action = 'check_out'
             else:
                 # Student has no active session - CHECK IN
@@ -95,43 +156,34 @@ class StudentLoginView(APIView):
                 # Create new session
                 new_session = GymSession.objects.create(
                     student=student,
-                    check_in_time=timezone.now(),
-                    date=timezone.now().date()
+                    check_in_time=now,
+                    date=today
                 )
                 active_session = new_session
                 message = f'Welcome, {student.full_name}! Checked in successfully.'
                 session_action = 'check_in'
             
-            # Refresh data after check-in/check-out
-            active_session = GymSession.objects.filter(
-                student=student,
-                is_active=True
-            ).first()
-            daily_minutes = GymSession.get_daily_gym_time(student)
-            can_check_in, remaining_minutes = GymSession.can_check_in(student)
-            
-            response_data = {
-                'student': StudentSerializer(student).data,
-                'has_active_session': active_session is not None,
-                'active_session': GymSessionSerializer(active_session).data if active_session else None,
-                'daily_gym_minutes': daily_minutes,
-                'remaining_daily_minutes': remaining_minutes,
-                'can_check_in': can_check_in,
-                'action_taken': session_action,
-                'completed_session': GymSessionSerializer(checked_out_session).data if checked_out_session else None
-            }
-            
-            return Response({
-                'success': True,
-                'message': message,
-                'data': response_data
-            }, status=status.HTTP_200_OK)
+            # Derive the post-tap state instead of re-querying it
+            can_check_in, remaining_minutes = GymSession.check_in_allowance(
+                daily_minutes, active_session is not None
+            )
+        
+        response_data = {
+            'student': StudentSerializer.cached_data(student, gym_totals),
+            'has_active_session': active_session is not None,
+            'active_session': GymSessionSerializer(active_session).data if active_session else None,
+            'daily_gym_minutes': daily_minutes,
+            'remaining_daily_minutes': remaining_minutes,
+            'can_check_in': can_check_in,
+            'action_taken': session_action,
+            'completed_session': GymSessionSerializer(checked_out_session).data if checked_out_session else None
+        }
         
         return Response({
-            'success': False,
-            'message': 'RFID not recognized. Please check your RFID or register first.',
-            'errors': serializer.errors
-        }, status=status.HTTP_400_BAD_REQUEST)
+            'success': True,
+            'message': message,
+            'data': response_data
+        }, status=status.HTTP_200_OK)
 
 
 class StudentIDLoginView(APIView):
@@ -146,17 +198,17 @@ class StudentIDLoginView(APIView):
         
         if serializer.is_valid():
             student_id = serializer.validated_data['student_id']
-            student = get_object_or_404(Student, student_id=student_id, is_active=True)
-            
-            # Check if student has an active session
-            active_session = GymSession.objects.filter(
-                student=student,
-                is_active=True
+            student = StudentSerializer.prefetch_queryset(Student.objects.all()).filter(
+                student_id=student_id, is_active=True
             ).first()
+            if student is None:
+                return student_not_found_response()
             
-            # Get daily gym time
-            daily_minutes = GymSession.get_daily_gym_time(student)
-            can_check_in, remaining_minutes = GymSession.can_check_in(student)
+            # Active session and today's gym time in a single query
+            active_session, daily_minutes = GymSession.get_daily_status(student)
+            can_check_in, remaining_minutes = GymSession.check_in_allowance(
+                daily_minutes, active_session is not None
+            )
             
             response_data = {
                 'student': StudentSerializer(student).data,
@@ -194,12 +246,12 @@ class GymCheckInOutView(APIView):
             student = serializer.validated_data['student']
             action = serializer.validated_data['action']
             active_session = serializer.validated_data.get('active_session')
+            now = timezone.now()
             
             try:
                 with transaction.atomic():
                     if action == 'check_in':
                         # Create new gym session
-                        now = timezone.now()
                         session = GymSession.objects.create(
                             student=student,
                             check_in_time=now,
@@ -218,14 +270,18 @@ class GymCheckInOutView(APIView):
                     
                     elif action == 'check_out':
                         # Complete the active session
-                        active_session.check_out_time = timezone.now()
+                        active_session.check_out_time = now
                         active_session.save()  # This will automatically calculate duration and set is_active=False
                         
-                        # Update daily stats
-                        DailyGymStats.update_daily_stats(student, active_session.date)
+                        # Daily stats are updated by the session signals, off the
+                        # request path
                         
                         # Get daily and total gym time for logout display
-                        daily_minutes = GymSession.get_daily_gym_time(student, active_session.date)
+                        if active_session.date == now.date():
+                            daily_minutes = (serializer.validated_data['daily_minutes']
+                                             + active_session.duration_minutes)
+                        else:
+                            daily_minutes = GymSession.get_daily_gym_time(student, active_session.date)
                         total_minutes = student.total_gym_time_minutes
                         
                         # Format time displays
@@ -265,17 +321,33 @@ class GymCheckInOutView(APIView):
         }, status=status.HTTP_400_BAD_REQUEST)
 
 
+def invalid_heatmap_range_response():
+    """400 response for an unsupported stats `range` parameter"""
+    return Response({
+        'success': False,
+        'message': f"Invalid range. Use one of: {', '.join(HEATMAP_RANGES)}",
+        'errors': {'range': ['Unsupported heatmap range.']}
+    }, status=status.HTTP_400_BAD_REQUEST)
+
+
 class StudentStatsView(APIView):
     """
     API endpoint for student statistics and heatmap data.
     GET: Get comprehensive stats for a student by student ID (legacy)
+    Optional ?range=30d|90d|1y|ytd selects the heatmap window (default ytd).
     """
     
     def get(self, request, student_id):
         """Get comprehensive statistics for a student by student ID"""
+        heatmap_range = request.query_params.get('range', DEFAULT_HEATMAP_RANGE)
+        if heatmap_range not in HEATMAP_RANGES:
+            return invalid_heatmap_range_response()
+        
         try:
-            student = get_object_or_404(Student, student_id=student_id, is_active=True)
-            stats_data = StudentStatsSerializer.get_student_stats(student)
+            student = Student.objects.filter(student_id=student_id, is_active=True).first()
+            if student is None:
+                return student_not_found_response()
+            stats_data = StudentStatsSerializer.get_student_stats(student, heatmap_range)
             
             return Response({
                 'success': True,
@@ -295,23 +367,29 @@ class StudentRFIDStatsView(APIView):
     """
     API endpoint for student statistics using RFID authentication.
     POST: Get comprehensive stats for a student by RFID
+    Optional `range` (30d|90d|1y|ytd) selects the heatmap window (default ytd).
     """
     
     def post(self, request):
         """Get comprehensive statistics for a student using RFID"""
-        print(f"DEBUG: RFID Stats request data: {request.data}")
+        heatmap_range = request.query_params.get('range', DEFAULT_HEATMAP_RANGE)
+        # Non-object bodies are left for the serializer to reject with a 400
+        if isinstance(request.data, Mapping):
+            heatmap_range = request.data.get('range', heatmap_range)
+        if heatmap_range not in HEATMAP_RANGES:
+            return invalid_heatmap_range_response()
+        
         serializer = StudentRFIDLoginSerializer(data=request.data)
         
         if serializer.is_valid():
             rfid = serializer.validated_data['rfid']
-            print(f"DEBUG: Looking up RFID: {rfid}")
-            student = get_object_or_404(Student, rfid=rfid, is_active=True)
-            print(f"DEBUG: Found student: {student.full_name}")
+            student = Student.objects.filter(rfid=rfid, is_active=True).first()
+            if student is None:
+                return student_not_found_response()
             
             try:
-                print(f"DEBUG: Getting stats for student: {student.student_id}")
-                stats_data = StudentStatsSerializer.get_student_stats(student)
-                print(f"DEBUG: Stats data generated successfully")
+                logger.debug("Getting stats for student %s", student.student_id)
+                stats_data = StudentStatsSerializer.get_student_stats(student, heatmap_range)
                 
                 return Response({
                     'success': True,
@@ -320,16 +398,14 @@ class StudentRFIDStatsView(APIView):
                 }, status=status.HTTP_200_OK)
             
             except Exception as e:
-                print(f"DEBUG: Error in stats generation: {str(e)}")
-                import traceback
-                traceback.print_exc()
+                logger.exception("Error generating stats for student %s", student.student_id)
                 return Response({
                     'success': False,
                     'message': f'Error retrieving statistics: {str(e)}',
                     'errors': {}
                 }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
         
-        print(f"DEBUG: Serializer errors: {serializer.errors}")
+        logger.debug("RFID stats lookup rejected: %s", serializer.errors)
         return Response({
             'success': False,
             'message': 'RFID not recognized. Please check your RFID or register first.',
@@ -343,7 +419,10 @@ def check_student_status(request, student_id):
     Quick endpoint to check if a student is registered and their current status.
     """
     try:
-        student = Student.objects.filter(student_id=student_id, is_active=True).first()
+        # Polling endpoint: load only the columns the summary below needs
+        student = Student.objects.only(
+            'student_id', 'first_name', 'last_name', 'block_section'
+        ).filter(student_id=student_id, is_active=True).first()
         
         if not student:
             return Response({
@@ -355,9 +434,10 @@ def check_student_status(request, student_id):
                 }
             }, status=status.HTTP_404_NOT_FOUND)
         
-        active_session = GymSession.objects.filter(student=student, is_active=True).first()
-        daily_minutes = GymSession.get_daily_gym_time(student)
-        can_check_in, remaining_minutes = GymSession.can_check_in(student)
+        active_session, daily_minutes = GymSession.get_daily_status(student)
+        can_check_in, remaining_minutes = GymSession.check_in_allowance(
+            daily_minutes, active_session is not None
+        )
         
         return Response({
             'success': True,
@@ -365,7 +445,12 @@ def check_student_status(request, student_id):
             'data': {
                 'is_registered': True,
                 'needs_registration': False,
-                'student': StudentSerializer(student).data,
+                'student': {
+                    'id': student.id,
+                    'student_id': student.student_id,
+                    'full_name': student.full_name,
+                    'block_section': student.block_section,
+                },
                 'has_active_session': active_session is not None,
                 'daily_gym_minutes': daily_minutes,
                 'remaining_daily_minutes': remaining_minutes,
@@ -387,17 +472,17 @@ class PDFExportView(APIView):
     Supports export by user, day, or block/section.
     """
     
-    def __init__(self):
-        super().__init__()
-        self.pdf_generator = PDFReportGenerator()
+    # Shared across requests: the generator only holds its read-only
+    # stylesheet, so building it once avoids redoing that per request
+    pdf_generator = PDFReportGenerator()
     
     def parse_date(self, date_string):
         """Parse date string in YYYY-MM-DD format"""
         if not date_string:
             return None
         try:
-            return datetime.strptime(date_string, '%Y-%m-%d').date()
-        except ValueError:
+            return date.fromisoformat(date_string)
+        except (TypeError, ValueError):
             return None
     
     def get(self, request):
@@ -431,36 +516,35 @@ class PDFExportView(APIView):
             }, status=status.HTTP_400_BAD_REQUEST)
         
         try:
-            # Check if student exists
-            student = Student.objects.get(student_id=student_id, is_active=True)
+            # Check if student exists (no need to hydrate the row here)
+            if not Student.objects.filter(student_id=student_id, is_active=True).exists():
+                return Response({
+                    'success': False,
+                    'message': 'Student not found',
+                    'errors': {}
+                }, status=status.HTTP_404_NOT_FOUND)
             
-            # Generate PDF
-            pdf_buffer = self.pdf_generator.generate_user_report(
+            # Generate PDF straight into the HTTP response
+            response = HttpResponse(content_type='application/pdf')
+            pdf_output = self.pdf_generator.generate_user_report(
                 student_id=student_id,
                 date_from=date_from,
-                date_to=date_to
+                date_to=date_to,
+                output=response
             )
             
-            if pdf_buffer is None:
+            if pdf_output is None:
                 return Response({
                     'success': False,
                     'message': 'Student not found',
                     'errors': {}
                 }, status=status.HTTP_404_NOT_FOUND)
             
-            # Create HTTP response
-            response = HttpResponse(pdf_buffer.getvalue(), content_type='application/pdf')
-            filename = f"gym_report_{student_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
+            filename = f"gym_report_{student_id}_{timezone.localtime().strftime('%Y%m%d_%H%M%S')}.pdf"
             response['Content-Disposition'] = f'attachment; filename="{filename}"'
             
             return response
             
-        except Student.DoesNotExist:
-            return Response({
-                'success': False,
-                'message': 'Student not found',
-                'errors': {}
-            }, status=status.HTTP_404_NOT_FOUND)
         except Exception as e:
             return Response({
                 'success': False,
@@ -488,11 +572,10 @@ class PDFExportView(APIView):
             }, status=status.HTTP_400_BAD_REQUEST)
         
         try:
-            # Generate PDF
-            pdf_buffer = self.pdf_generator.generate_daily_report(target_date)
+            # Generate PDF straight into the HTTP response
+            response = HttpResponse(content_type='application/pdf')
+            self.pdf_generator.generate_daily_report(target_date, output=response)
             
-            # Create HTTP response
-            response = HttpResponse(pdf_buffer.getvalue(), content_type='application/pdf')
             filename = f"daily_gym_report_{target_date.strftime('%Y%m%d')}.pdf"
             response['Content-Disposition'] = f'attachment; filename="{filename}"'
             
@@ -519,23 +602,23 @@ class PDFExportView(APIView):
             }, status=status.HTTP_400_BAD_REQUEST)
         
         try:
-            # Generate PDF
-            pdf_buffer = self.pdf_generator.generate_block_report(
+            # Generate PDF straight into the HTTP response
+            response = HttpResponse(content_type='application/pdf')
+            pdf_output = self.pdf_generator.generate_block_report(
                 block_section=block_section,
                 date_from=date_from,
-                date_to=date_to
+                date_to=date_to,
+                output=response
             )
             
-            if pdf_buffer is None:
+            if pdf_output is None:
                 return Response({
                     'success': False,
                     'message': f'No students found for block/section: {block_section}',
                     'errors': {}
                 }, status=status.HTTP_404_NOT_FOUND)
             
-            # Create HTTP response
-            response = HttpResponse(pdf_buffer.getvalue(), content_type='application/pdf')
-            filename = f"block_report_{block_section}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
+            filename = f"block_report_{block_section}_{timezone.localtime().strftime('%Y%m%d_%H%M%S')}.pdf"
             response['Content-Disposition'] = f'attachment; filename="{filename}"'
             
             return response
@@ -554,13 +637,13 @@ def get_available_blocks(request):
     Get list of all available blocks/sections for PDF export filtering.
     """
     try:
-        blocks = Student.objects.filter(is_active=True).values_list('block_section', flat=True).distinct().order_by('block_section')
+        blocks = get_available_blocks_cached()
         
         return Response({
             'success': True,
             'message': 'Available blocks retrieved successfully',
             'data': {
-                'blocks': list(blocks)
+                'blocks': blocks
             }
         }, status=status.HTTP_200_OK)
     
@@ -602,9 +685,7 @@ class FeedbackView(APIView):
                     'errors': {}
                 }, status=status.HTTP_400_BAD_REQUEST)
 
-            feedback_dir = Path(settings.BASE_DIR) / 'OLD_LOGS'
-            feedback_dir.mkdir(exist_ok=True)
-            feedback_file = feedback_dir / 'feedback.jsonl'
+            feedback_file = Path(settings.BASE_DIR) / 'OLD_LOGS' / 'feedback.jsonl'
 
             # Persist to DB
             feedback = Feedback.objects.create(
@@ -615,9 +696,11 @@ class FeedbackView(APIView):
                 source_ip=request.META.get('REMOTE_ADDR')
             )
 
-            # Also append to file for redundancy
-            with open(feedback_file, 'a', encoding='utf-8') as f:
-                f.write(json.dumps(FeedbackSerializer(feedback).data, ensure_ascii=False) + '\n')
+            # Also append to file for redundancy, off the request path.
+            # Same shape as FeedbackSerializer, built from the payload directly.
+            record = {'id': feedback.id, **payload}
+            record['submitted_at'] = timezone.localtime(feedback.submitted_at).isoformat()
+            append_jsonl(feedback_file, record)
 
             return Response({
                 'success': True,
@@ -631,6 +714,26 @@ class FeedbackView(APIView):
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+class FeedbackPagination(PageNumberPagination):
+    """
+    Opt-in paging: without ?page= or ?page_size= the list is returned as a
+    plain array, as it was before paging existed
+    """
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if self.page_query_param not in params and self.page_size_query_param not in params:
+            return None
+        return super().paginate_queryset(queryset, request, view)
+
+
 class FeedbackListView(generics.ListAPIView):
-    queryset = Feedback.objects.all().order_by('-submitted_at')
-    serializer_class = FeedbackSerializer
\ No newline at end of file
+    # Only the serialized columns; the submitted_at index serves the ordering
+    queryset = Feedback.objects.only(
+        'id', 'full_name', 'block_section', 'email', 'message', 'submitted_at'
+    ).order_by('-submitted_at')
+    serializer_class = FeedbackSerializer
+    pagination_class = FeedbackPagination
\ No newline at end of file
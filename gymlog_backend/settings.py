@@ -12,6 +12,8 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 
 from pathlib import Path
 
+from decouple import config
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -81,10 +83,45 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Reuse connections across requests instead of reconnecting each time
+        'CONN_MAX_AGE': 60,
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
 
+# Cache and sessions
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# Set REDIS_URL (e.g. redis://127.0.0.1:6379/1) to share the cache between
+# worker processes and keep sessions out of the database entirely.
+# REDIS_URL is required whenever more than one process serves requests:
+# cached stats are invalidated by bumping per-student version keys, and with
+# the per-process local-memory fallback a bump in one worker is invisible to
+# the others, which keep serving stale heatmaps and stats until expiry.
+
+REDIS_URL = config('REDIS_URL', default='')
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+    SESSION_ENGINE = 'django.contrib.sessions.backends.cache'
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+    # The local-memory cache is per process, so keep the database as the
+    # source of truth and only skip it on cache hits
+    SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
+SESSION_CACHE_ALIAS = 'default'
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -145,3 +182,8 @@ REST_FRAMEWORK = {
         'rest_framework.renderers.JSONRenderer',
     ],
 }
+
+# Recompute student stats and check-out bookkeeping in a background thread
+# after gym sessions change, so the stats endpoint can usually answer straight
+# from the cache and check-outs don't wait on the daily stats upsert
+GYM_STATS_BACKGROUND_REFRESH = True
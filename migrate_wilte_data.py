@@ -15,7 +15,7 @@ Requirements:
 import os
 import sys
 import django
-from datetime import datetime, date, timedelta
+from datetime import datetime, date
 from django.utils import timezone
 
 # Setup Django environment
@@ -23,6 +23,7 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'gymlog_backend.settings')
 django.setup()
 
 from gym_app.models import Student, GymSession, DailyGymStats
+from gym_app.caching import bump_student_version
 from django.db import transaction
 
 
@@ -31,6 +32,8 @@ class WilteMigration:
         self.student_id = "2024-140258"
         self.full_name = "Wilte V. Dela Cruz"
         self.student = None
+        # Asia/Manila has no DST, so attaching the zone directly is safe
+        tz = timezone.get_default_timezone()
         
         # Define Wilte's gym session data from old logs
         # Note: Using start/end times for accurate duration calculation
@@ -38,20 +41,20 @@ class WilteMigration:
         self.session_data = [
             {
                 'date': date(2025, 8, 11),
-                'start_time': '09:32:45',
-                'end_time': '20:34:32',
+                'start_datetime': datetime(2025, 8, 11, 9, 32, 45, tzinfo=tz),
+                'end_datetime': datetime(2025, 8, 11, 20, 34, 32, tzinfo=tz),
                 'note': 'Long session - ~11 hours'
             },
             {
                 'date': date(2025, 8, 15),
-                'start_time': '10:55:24',
-                'end_time': '10:55:39',
+                'start_datetime': datetime(2025, 8, 15, 10, 55, 24, tzinfo=tz),
+                'end_datetime': datetime(2025, 8, 15, 10, 55, 39, tzinfo=tz),
                 'note': 'Very short session - 15 seconds'
             },
             {
                 'date': date(2025, 8, 15),
-                'start_time': '10:55:44',
-                'end_time': '18:13:53',
+                'start_datetime': datetime(2025, 8, 15, 10, 55, 44, tzinfo=tz),
+                'end_datetime': datetime(2025, 8, 15, 18, 13, 53, tzinfo=tz),
                 'note': 'Normal session - ~7.3 hours'
             }
         ]
@@ -62,7 +65,10 @@ class WilteMigration:
         
         # Find the student (should already be registered)
         try:
-            self.student = Student.objects.get(student_id=self.student_id)
+            # Only the name columns are read; the totals are computed properties
+            self.student = Student.objects.only(
+                'id', 'student_id', 'first_name', 'last_name'
+            ).get(student_id=self.student_id)
             print(f"✅ Found student: {self.student.full_name}")
         except Student.DoesNotExist:
             print(f"❌ ERROR: Student with ID {self.student_id} not found!")
@@ -70,36 +76,55 @@ class WilteMigration:
             return False
         
         # Check if sessions already exist
-        existing_sessions = GymSession.objects.filter(student=self.student)
-        if existing_sessions.exists():
-            print(f"⚠️  WARNING: Student already has {existing_sessions.count()} gym sessions.")
+        existing_count = GymSession.objects.filter(student=self.student).count()
+        if existing_count > 0:
+            print(f"⚠️  WARNING: Student already has {existing_count} gym sessions.")
             response = input("Do you want to continue and add more sessions? (y/N): ")
             if response.lower() != 'y':
                 print("Migration cancelled.")
                 return False
         
         # Import sessions
-        success_count = 0
         total_sessions = len(self.session_data)
         
         print(f"\n📥 Importing {total_sessions} gym sessions...")
         
+        # Build every session up front, then check duplicates in one query
+        new_sessions = []
+        for i, session_info in enumerate(self.session_data, 1):
+            print(f"\n[{i}/{total_sessions}] Processing session for {session_info['date']}...")
+            session = self.build_gym_session(session_info)
+            if session is not None:
+                new_sessions.append(session)
+        
         with transaction.atomic():
-            for i, session_info in enumerate(self.session_data, 1):
-                print(f"\n[{i}/{total_sessions}] Processing session for {session_info['date']}...")
-                
-                success = self.create_gym_session(session_info)
-                if success:
-                    success_count += 1
-                    print(f"  ✅ Session created successfully")
-                else:
-                    print(f"  ⚠️  Session skipped (duplicate or error)")
+            existing_starts = set(GymSession.objects.filter(
+                student=self.student,
+                date__in={session.date for session in new_sessions},
+                check_in_time__in=[session.check_in_time for session in new_sessions],
+            ).values_list('date', 'check_in_time'))
+            
+            sessions_to_create = []
+            for session in new_sessions:
+                if (session.date, session.check_in_time) in existing_starts:
+                    print(f"  ⚠️  Duplicate session on {session.date} at "
+                          f"{timezone.localtime(session.check_in_time).time()}, skipping...")
+                    continue
+                sessions_to_create.append(session)
+            
+            GymSession.objects.bulk_create(sessions_to_create, batch_size=500)
+        success_count = len(sessions_to_create)
         
         # Update daily stats for all dates
         print(f"\n📊 Updating daily statistics...")
-        dates_to_update = list(set(session['date'] for session in self.session_data))
+        dates_to_update = sorted(set(session['date'] for session in self.session_data))
+        # One grouped aggregate and one upsert for every date
+        DailyGymStats.bulk_update_daily_stats(
+            (self.student.id, session_date) for session_date in dates_to_update
+        )
+        # The bulk upsert skips the save signals that invalidate cached stats
+        bump_student_version(self.student.id)
         for session_date in dates_to_update:
-            DailyGymStats.update_daily_stats(self.student, session_date)
             print(f"  ✅ Updated stats for {session_date}")
         
         # Print summary
@@ -116,43 +141,19 @@ class WilteMigration:
         
         return True
     
-    def create_gym_session(self, session_info):
-        """Create a single gym session"""
+    def build_gym_session(self, session_info):
+        """Build an unsaved gym session, or None if the session data is invalid"""
         try:
-            # Parse times
             session_date = session_info['date']
-            start_time = datetime.strptime(session_info['start_time'], '%H:%M:%S').time()
-            end_time = datetime.strptime(session_info['end_time'], '%H:%M:%S').time()
-            
-            # Create datetime objects
-            start_datetime = datetime.combine(session_date, start_time)
-            end_datetime = datetime.combine(session_date, end_time)
-            
-            # Handle overnight sessions (end time next day)
-            if end_datetime < start_datetime:
-                end_datetime += timedelta(days=1)
-            
-            # Convert to timezone-aware datetimes
-            start_datetime = timezone.make_aware(start_datetime)
-            end_datetime = timezone.make_aware(end_datetime)
+            start_datetime = session_info['start_datetime']
+            end_datetime = session_info['end_datetime']
             
             # Calculate duration
             duration_seconds = (end_datetime - start_datetime).total_seconds()
             duration_minutes = int(duration_seconds / 60)
             
-            # Check for duplicates
-            existing = GymSession.objects.filter(
-                student=self.student,
-                date=session_date,
-                check_in_time=start_datetime,
-            ).first()
-            
-            if existing:
-                print(f"    ⚠️  Duplicate session found, skipping...")
-                return False
-            
-            # Create the session
-            session = GymSession.objects.create(
+            print(f"    📝 Prepared session: {start_datetime.time()} - {end_datetime.time()} ({duration_minutes} min)")
+            return GymSession(
                 student=self.student,
                 check_in_time=start_datetime,
                 check_out_time=end_datetime,
@@ -161,12 +162,9 @@ class WilteMigration:
                 is_active=False  # All migrated sessions are completed
             )
             
-            print(f"    📝 Created session: {start_time} - {end_time} ({duration_minutes} min)")
-            return True
-            
         except Exception as e:
-            print(f"    ❌ Error creating session: {str(e)}")
-            return False
+            print(f"    ❌ Error preparing session: {str(e)}")
+            return None
 
 
 def main():
@@ -3,7 +3,9 @@
 🚀 Quick Setup Script - APC Gym Log System
 This script automatically sets up the project on a new computer after downloading from Google Drive.
 
-Usage: python quick-setup.py
+Usage: python quick-setup.py [--full]
+
+    --full  Also run a production frontend build while verifying
 """
 
 import subprocess
@@ -11,6 +13,11 @@ import sys
 import os
 import time
 import platform
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
+from io import StringIO
 from pathlib import Path
 
 class Colors:
@@ -22,8 +29,43 @@ class Colors:
     BOLD = '\033[1m'
     END = '\033[0m'
 
+class StepOutput:
+    """
+    Stand-in for sys.stdout while setup steps run in parallel: output from a
+    thread that registered a buffer goes there, everything else passes through
+    """
+    def __init__(self, stream):
+        self.stream = stream
+        self.local = threading.local()
+    
+    def buffer(self):
+        return getattr(self.local, 'buffer', None)
+    
+    def write(self, text):
+        return (self.buffer() or self.stream).write(text)
+    
+    def flush(self):
+        (self.buffer() or self.stream).flush()
+    
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+def is_output_buffered():
+    """True when called from a parallel step whose output is being buffered"""
+    return isinstance(sys.stdout, StepOutput) and sys.stdout.buffer() is not None
+
+# Only emit ANSI codes to an interactive terminal (FORCE_COLOR overrides),
+# so redirected logs stay plain text
+USE_COLOR = bool(
+    (sys.stdout.isatty() and platform.system() != 'Windows')
+    or os.environ.get('FORCE_COLOR')
+)
+
 def print_colored(message, color=Colors.END):
     """Print colored message to terminal"""
+    if not USE_COLOR:
+        print(message)
+        return
     print(f"{color}{message}{Colors.END}")
 
 def print_header(title):
@@ -48,31 +90,49 @@ def print_warning(message):
     """Print warning message"""
     print_colored(f"⚠️  {message}", Colors.YELLOW)
 
+# Resolved once; on Windows these are .cmd shims that need their full path
+# when run without a shell
+NODE = shutil.which("node") or "node"
+NPM = shutil.which("npm") or "npm"
+NPX = shutil.which("npx") or "npx"
+
+# --full also runs a production frontend build when verifying (e.g. for CI)
+FULL_VERIFY = "--full" in sys.argv[1:]
+
 def run_command(command, description="", check_output=False, timeout=300):
-    """Run a command and return success status"""
+    """
+    Run a command and return success status. A string runs through the shell;
+    an argument list runs the program directly.
+    """
+    shell = isinstance(command, str)
+    command_text = command if shell else subprocess.list2cmdline(command)
     try:
         if description:
             print(f"   Running: {description}")
         
-        if check_output:
+        if check_output or is_output_buffered():
             result = subprocess.run(
                 command, 
-                shell=True, 
+                shell=shell, 
                 check=True, 
                 capture_output=True, 
                 text=True,
                 timeout=timeout
             )
+            if not check_output:
+                # Keep the command's output with the rest of this step's output
+                print(result.stdout, end="")
+                return True, ""
             return True, result.stdout.strip()
         else:
-            subprocess.run(command, shell=True, check=True, timeout=timeout)
+            subprocess.run(command, shell=shell, check=True, timeout=timeout)
             return True, ""
     
     except subprocess.TimeoutExpired:
-        print_error(f"Command timed out after {timeout} seconds: {command}")
+        print_error(f"Command timed out after {timeout} seconds: {command_text}")
         return False, ""
     except subprocess.CalledProcessError as e:
-        print_error(f"Command failed: {command}")
+        print_error(f"Command failed: {command_text}")
         if hasattr(e, 'stderr') and e.stderr:
             print_error(f"Error output: {e.stderr}")
         return False, ""
@@ -95,12 +155,29 @@ def check_python_version():
     print_success("Python version is compatible")
     return True
 
+# Prints "<node version>|<npm version>"; npm's part is empty if it can't run
+TOOL_VERSIONS_SCRIPT = (
+    "let npm = '';"
+    "try { npm = require('child_process').execSync('npm --version').toString().trim(); }"
+    "catch (e) {}"
+    "console.log('v' + process.versions.node + '|' + npm);"
+)
+
+@lru_cache(maxsize=None)
+def get_tool_versions():
+    """Node.js and npm versions from a single node process; None if unavailable"""
+    success, output = run_command([NODE, "-e", TOOL_VERSIONS_SCRIPT], "Checking Node.js and npm versions", check_output=True)
+    if not success:
+        return None, None
+    node_version, _, npm_version = output.partition('|')
+    return node_version, npm_version or None
+
 def check_node_version():
     """Check if Node.js is installed and compatible"""
     print_step(2, "Checking Node.js version")
     
-    success, output = run_command("node --version", "Checking Node.js version", check_output=True)
-    if not success:
+    output, _ = get_tool_versions()
+    if output is None:
         print_error("Node.js is not installed!")
         print("   Please download from: https://nodejs.org")
         return False
@@ -126,8 +203,8 @@ def check_node_version():
 
 def check_npm():
     """Check if npm is available"""
-    success, output = run_command("npm --version", "Checking npm version", check_output=True)
-    if success:
+    _, output = get_tool_versions()
+    if output:
         print(f"   npm version: {output}")
         print_success("npm is available")
         return True
@@ -147,9 +224,17 @@ def check_project_files():
         "src/main.jsx"
     ]
     
+    # List each parent directory once instead of probing every file
+    directory_entries = {}
     missing_files = []
     for file_path in required_files:
-        if not Path(file_path).exists():
+        path = Path(file_path)
+        if path.parent not in directory_entries:
+            try:
+                directory_entries[path.parent] = set(os.listdir(path.parent))
+            except OSError:
+                directory_entries[path.parent] = set()
+        if path.name not in directory_entries[path.parent]:
             missing_files.append(file_path)
         else:
             print(f"   ✓ {file_path}")
@@ -176,18 +261,15 @@ def check_database():
         print_warning("Database file not found - will be created during migration")
         return True
 
-def install_python_dependencies():
-    """Install Python dependencies"""
-    print_step(4, "Installing Python dependencies")
-    
-    # Check if virtual environment should be created
+def check_virtual_environment():
+    """Offer to create a virtual environment before installing Python packages"""
     if not Path("venv").exists() and not os.environ.get('VIRTUAL_ENV'):
         print("   No virtual environment detected.")
         create_venv = input("   Create virtual environment? (recommended) [Y/n]: ").strip().lower()
         
         if create_venv != 'n':
             print("   Creating virtual environment...")
-            success, _ = run_command("python -m venv venv", "Creating virtual environment")
+            success, _ = run_command([sys.executable, "-m", "venv", "venv"], "Creating virtual environment")
             if not success:
                 print_error("Failed to create virtual environment")
                 return False
@@ -204,12 +286,28 @@ def install_python_dependencies():
             print_warning(f"   python quick-setup.py")
             return False
     
+    return True
+
+def install_python_dependencies():
+    """Install Python dependencies"""
+    print_step(4, "Installing Python dependencies")
+    
     print("   Installing packages from requirements.txt...")
+    pip_install = [sys.executable, "-m", "pip", "install", "--disable-pip-version-check"]
+    
+    # Wheels only first: source builds of C extensions are the slow part
     success, _ = run_command(
-        "pip install -r requirements.txt", 
-        "Installing Python packages",
+        pip_install + ["--prefer-binary", "--only-binary=:all:", "-r", "requirements.txt"],
+        "Installing Python packages (wheels only)",
         timeout=600  # 10 minutes timeout for pip install
     )
+    if not success:
+        print_warning("Some packages have no wheel for this platform, retrying with source builds allowed")
+        success, _ = run_command(
+            pip_install + ["--prefer-binary", "-r", "requirements.txt"],
+            "Installing Python packages",
+            timeout=600
+        )
     
     if success:
         print_success("Python dependencies installed successfully")
@@ -223,21 +321,34 @@ def install_node_dependencies():
     """Install Node.js dependencies"""
     print_step(5, "Installing Node.js dependencies")
     
-    # Clean install for better reliability
-    if Path("node_modules").exists():
-        print("   Removing existing node_modules...")
-        try:
-            import shutil
-            shutil.rmtree("node_modules")
-        except Exception as e:
-            print_warning(f"Could not remove node_modules: {e}")
+    success = False
     
-    print("   Installing packages from package.json...")
-    success, _ = run_command(
-        "npm install", 
-        "Installing Node.js packages",
-        timeout=600  # 10 minutes timeout for npm install
-    )
+    # With a lockfile, npm ci installs the locked tree without re-resolving it
+    if Path("package-lock.json").exists():
+        print("   Installing packages from package-lock.json...")
+        success, _ = run_command(
+            [NPM, "ci"],
+            "Installing Node.js packages (npm ci)",
+            timeout=600  # 10 minutes timeout for npm ci
+        )
+        if not success:
+            print_warning("npm ci failed, falling back to a clean npm install")
+    
+    if not success:
+        # Clean install for better reliability
+        if Path("node_modules").exists():
+            print("   Removing existing node_modules...")
+            try:
+                shutil.rmtree("node_modules")
+            except Exception as e:
+                print_warning(f"Could not remove node_modules: {e}")
+        
+        print("   Installing packages from package.json...")
+        success, _ = run_command(
+            [NPM, "install"],
+            "Installing Node.js packages",
+            timeout=600  # 10 minutes timeout for npm install
+        )
     
     if success:
         print_success("Node.js dependencies installed successfully")
@@ -252,7 +363,7 @@ def setup_database():
     print_step(6, "Setting up database")
     
     print("   Running Django migrations...")
-    success, _ = run_command("python manage.py migrate", "Running database migrations")
+    success, _ = run_command([sys.executable, "manage.py", "migrate"], "Running database migrations")
     
     if success:
         print_success("Database setup completed")
@@ -279,7 +390,7 @@ def verify_installation():
     # Check if manage.py commands work
     print("   Testing Django configuration...")
     success, _ = run_command(
-        "python manage.py check", 
+        [sys.executable, "manage.py", "check"],
         "Running Django system check",
         timeout=30
     )
@@ -290,20 +401,42 @@ def verify_installation():
         print_error("Django configuration check failed")
         return False
     
-    # Check if frontend build works
-    print("   Testing frontend build...")
+    if FULL_VERIFY:
+        # Check if frontend build works
+        print("   Testing frontend build...")
+        success, _ = run_command(
+            [NPM, "run", "build"], 
+            "Testing frontend build",
+            timeout=120
+        )
+        
+        if success:
+            print_success("Frontend build successful")
+        else:
+            print_warning("Frontend build test failed (but project may still work)")
+        return True
+    
+    # Quick frontend check: Node can read the manifest and Vite is installed
+    print("   Testing frontend tooling...")
     success, _ = run_command(
-        "npm run build", 
-        "Testing frontend build",
-        timeout=120
+        [NODE, "-e", "require('./package.json')"],
+        "Reading package.json with Node.js",
+        timeout=30
     )
+    if success:
+        success, output = run_command(
+            [NPX, "--no-install", "vite", "--version"],
+            "Checking Vite",
+            check_output=True,
+            timeout=30
+        )
     
     if success:
-        print_success("Frontend build successful")
-        return True
+        print(f"   Vite version: {output}")
+        print_success("Frontend tooling is ready (run with --full to test a build)")
     else:
-        print_warning("Frontend build test failed (but project may still work)")
-        return True
+        print_warning("Frontend tooling check failed (but project may still work)")
+    return True
 
 def provide_next_steps():
     """Provide instructions for next steps"""
@@ -333,6 +466,39 @@ def provide_next_steps():
     
     print_colored("\n🎯 Happy coding! Your gym log system is ready to go!", Colors.BOLD + Colors.GREEN)
 
+def run_steps_in_parallel(steps):
+    """
+    Run independent setup steps concurrently. Each step's output is buffered
+    and printed in one piece when it finishes. Yields (step_name, success).
+    """
+    output = StepOutput(sys.stdout)
+    print_lock = threading.Lock()
+    
+    def run_step(step_function):
+        output.local.buffer = StringIO()
+        try:
+            return step_function()
+        except Exception as e:
+            print_error(f"Unexpected error: {str(e)}")
+            return False
+        finally:
+            with print_lock:
+                output.stream.write(output.local.buffer.getvalue())
+                output.stream.flush()
+            output.local.buffer = None
+    
+    sys.stdout = output
+    try:
+        with ThreadPoolExecutor(max_workers=len(steps)) as executor:
+            futures = {
+                executor.submit(run_step, step_function): step_name
+                for step_name, step_function in steps
+            }
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+    finally:
+        sys.stdout = output.stream
+
 def main():
     """Main setup function"""
     print_header("APC Gym Log System - Quick Setup")
@@ -346,14 +512,19 @@ def main():
         return
     
     # Track setup success
-    setup_steps = [
+    check_steps = [
         ("Check Python version", check_python_version),
         ("Check Node.js version", check_node_version),
         ("Check npm availability", check_npm),
         ("Verify project files", check_project_files),
         ("Check database", check_database),
+    ]
+    # pip and npm don't depend on each other, so they install concurrently
+    install_steps = [
         ("Install Python dependencies", install_python_dependencies),
         ("Install Node.js dependencies", install_node_dependencies),
+    ]
+    final_steps = [
         ("Setup database", setup_database),
         ("Verify installation", verify_installation),
     ]
@@ -361,16 +532,32 @@ def main():
     failed_steps = []
     
     # Execute setup steps
-    for step_name, step_function in setup_steps:
+    for step_name, step_function in check_steps:
+        if not step_function():
+            failed_steps.append(step_name)
+    
+    # Prompts can't run inside the parallel steps; ask about the venv first
+    failed_installs = []
+    if not check_virtual_environment():
+        failed_installs.append("Install Python dependencies")
+        install_steps = install_steps[1:]
+    
+    for step_name, success in run_steps_in_parallel(install_steps):
+        if not success:
+            failed_installs.append(step_name)
+    
+    for step_name in failed_installs:
+        failed_steps.append(step_name)
+        
+        # Ask if user wants to continue
+        continue_setup = input(f"\n❓ {step_name} failed. Continue anyway? [y/N]: ").strip().lower()
+        if continue_setup != 'y':
+            print("\nSetup aborted.")
+            return
+    
+    for step_name, step_function in final_steps:
         if not step_function():
             failed_steps.append(step_name)
-            
-            # Ask if user wants to continue
-            if step_name in ["Install Python dependencies", "Install Node.js dependencies"]:
-                continue_setup = input(f"\n❓ {step_name} failed. Continue anyway? [y/N]: ").strip().lower()
-                if continue_setup != 'y':
-                    print("\nSetup aborted.")
-                    return
     
     # Final results
     print_header("Setup Results")
@@ -8,7 +8,7 @@ import os
 import sys
 import django
 from datetime import datetime, timedelta
-from random import randint, choice
+from random import Random, randint, choice
 
 # Add the parent directory to Python path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -17,7 +17,12 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'gymlog_backend.settings')
 django.setup()
 
-from gym_app.models import Student, GymSession, DailyGymStats
+from gym_app.models import Student, GymSession, DailyGymStats, StudentAggregate
+from gym_app.caching import (
+    bump_student_version, invalidate_student_lookups, invalidate_available_blocks
+)
+from django.db import connection, transaction
+from django.db.models import Count, Exists, OuterRef
 from django.utils import timezone
 
 
@@ -63,75 +68,137 @@ def create_sample_students():
         }
     ]
     
-    created_students = []
-    for student_data in sample_students:
-        student, created = Student.objects.get_or_create(
-            student_id=student_data['student_id'],
-            defaults=student_data
+    student_ids = [student_data['student_id'] for student_data in sample_students]
+    
+    with transaction.atomic():
+        existing_ids = set(
+            Student.objects.filter(student_id__in=student_ids)
+            .values_list('student_id', flat=True)
         )
-        if created:
-            print(f"✓ Created student: {student.full_name} ({student.student_id})")
-        else:
+        # One multi-row INSERT; rows that already exist are skipped by the DB
+        Student.objects.bulk_create(
+            [Student(**student_data) for student_data in sample_students],
+            ignore_conflicts=True,
+            batch_size=500
+        )
+        students_by_id = {
+            student.student_id: student
+            for student in Student.objects.filter(student_id__in=student_ids)
+        }
+        # bulk_create skips the post_save signal that creates aggregate rows
+        StudentAggregate.objects.bulk_create(
+            [StudentAggregate(student=student) for student in students_by_id.values()],
+            ignore_conflicts=True
+        )
+    
+    # Likewise for the signals that clear cached lookups and block lists
+    invalidate_student_lookups(student_ids=student_ids)
+    invalidate_available_blocks()
+    
+    created_students = []
+    for student_id in student_ids:
+        student = students_by_id[student_id]
+        if student_id in existing_ids:
             print(f"○ Student already exists: {student.full_name} ({student.student_id})")
+        else:
+            print(f"✓ Created student: {student.full_name} ({student.student_id})")
         created_students.append(student)
     
     return created_students
 
 
+def binomial(rng, n, p):
+    """Number of successes in n trials with probability p"""
+    if hasattr(rng, 'binomialvariate'):  # Python 3.12+
+        return rng.binomialvariate(n, p)
+    return sum(rng.random() < p for _ in range(n))
+
+
+SESSION_INSERT_FIELDS = (
+    'student', 'check_in_time', 'check_out_time', 'duration_minutes', 'date', 'is_active'
+)
+
+
+def insert_completed_sessions(rows):
+    """
+    Insert gym session rows (tuples in SESSION_INSERT_FIELDS order) with one
+    executemany on the DB cursor, skipping model instances and signals.
+    """
+    opts = GymSession._meta
+    fields = [opts.get_field(name) for name in SESSION_INSERT_FIELDS]
+    quote = connection.ops.quote_name
+    sql = "INSERT INTO {} ({}) VALUES ({})".format(
+        quote(opts.db_table),
+        ", ".join(quote(field.column) for field in fields),
+        ", ".join(["%s"] * len(fields))
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, [
+            [field.get_db_prep_save(value, connection) for field, value in zip(fields, row)]
+            for row in rows
+        ])
+
+
 def create_sample_gym_sessions(students):
     """Create sample gym sessions for the past 30 days"""
     print("\nCreating sample gym sessions...")
     
     now = timezone.now()
-    sessions_created = 0
+    sessions = []
+    student_dates = set()
+    # Seeded so every run produces the same sample data
+    rng = Random(42)
+    
+    # Some students are more active than others (percent chance per day)
+    activity_percent = {
+        '2023-123456': 80,  # Very active
+        '2023-234567': 60,  # Moderately active
+        '2023-345678': 40,  # Less active
+        '2022-456789': 70,  # Active
+        '2024-567890': 30,  # Occasional
+    }
     
     for student in students:
-        # Create sessions for the past 30 days with varying frequency
-        for days_ago in range(30):
+        probability = activity_percent.get(student.student_id, 50) / 100
+        
+        # Draw how many of the past 30 days had a session, then which ones
+        active_days = binomial(rng, 30, probability)
+        for days_ago in sorted(rng.sample(range(30), active_days)):
             date = now - timedelta(days=days_ago)
             
-            # Some students are more active than others
-            activity_probability = {
-                '2023-123456': 0.8,  # Very active
-                '2023-234567': 0.6,  # Moderately active
-                '2023-345678': 0.4,  # Less active
-                '2022-456789': 0.7,  # Active
-                '2024-567890': 0.3,  # Occasional
-            }
+            # Random session duration between 30-120 minutes
+            duration = rng.randint(30, 120)
+            
+            # Create check-in time (random hour between 6 AM and 8 PM)
+            check_in_hour = rng.randint(6, 20)
+            check_in_minute = rng.randint(0, 59)
+            
+            check_in_time = datetime(
+                date.year, date.month, date.day,
+                check_in_hour, check_in_minute,
+                tzinfo=date.tzinfo
+            )
+            
+            check_out_time = check_in_time + timedelta(minutes=duration)
             
-            # Random chance to have a session on this day
-            if randint(1, 100) <= (activity_probability.get(student.student_id, 0.5) * 100):
-                # Random session duration between 30-120 minutes
-                duration = randint(30, 120)
-                
-                # Create check-in time (random hour between 6 AM and 8 PM)
-                check_in_hour = randint(6, 20)
-                check_in_minute = randint(0, 59)
-                
-                check_in_time = date.replace(
-                    hour=check_in_hour,
-                    minute=check_in_minute,
-                    second=0,
-                    microsecond=0
-                )
-                
-                check_out_time = check_in_time + timedelta(minutes=duration)
-                
-                # Create the session
-                session = GymSession.objects.create(
-                    student=student,
-                    check_in_time=check_in_time,
-                    check_out_time=check_out_time,
-                    duration_minutes=duration,
-                    date=check_in_time.date(),
-                    is_active=False
-                )
-                
-                # Update daily stats
-                DailyGymStats.update_daily_stats(student, session.date)
-                sessions_created += 1
-    
-    print(f"✓ Created {sessions_created} sample gym sessions")
+            # Collect the session; all of them are inserted at once below
+            sessions.append((
+                student.id, check_in_time, check_out_time, duration,
+                check_in_time.date(), False
+            ))
+            student_dates.add((student.id, check_in_time.date()))
+    
+    with transaction.atomic():
+        insert_completed_sessions(sessions)
+        
+        # Update daily stats once per student and day
+        DailyGymStats.bulk_update_daily_stats(student_dates)
+    
+    # The raw insert skips the save signals that invalidate cached stats
+    for student in students:
+        bump_student_version(student.id)
+    
+    print(f"✓ Created {len(sessions)} sample gym sessions")
 
 
 def create_active_sessions(students):
@@ -141,9 +208,14 @@ def create_active_sessions(students):
     # Make 1-2 students currently active
     active_students = students[:2]
     
+    # Students that already have an active session, in one query
+    already_active = set(
+        GymSession.objects.filter(student__in=active_students, is_active=True)
+        .values_list('student_id', flat=True)
+    )
+    
     for student in active_students:
-        # Check if already has active session
-        if not GymSession.objects.filter(student=student, is_active=True).exists():
+        if student.id not in already_active:
             # Create active session that started 15-60 minutes ago
             minutes_ago = randint(15, 60)
             check_in_time = timezone.now() - timedelta(minutes=minutes_ago)
@@ -176,11 +248,17 @@ def main():
         print("\n" + "=" * 50)
         print("✅ Development setup completed successfully!")
         print("\nSample students created:")
+        # Session counts and active flags for every student in one query
+        summaries = Student.objects.filter(pk__in=[student.pk for student in students]).annotate(
+            sessions_count=Count('gym_sessions'),
+            has_active_session=Exists(
+                GymSession.objects.filter(student=OuterRef('pk'), is_active=True)
+            )
+        ).in_bulk()
         for student in students:
-            sessions_count = student.gym_sessions.count()
-            active_session = student.gym_sessions.filter(is_active=True).first()
-            status = "🔴 ACTIVE" if active_session else "⭕ INACTIVE"
-            print(f"  • {student.full_name} ({student.student_id}) - {sessions_count} sessions {status}")
+            summary = summaries[student.pk]
+            status = "🔴 ACTIVE" if summary.has_active_session else "⭕ INACTIVE"
+            print(f"  • {student.full_name} ({student.student_id}) - {summary.sessions_count} sessions {status}")
         
         print(f"\nYou can now:")
         print("1. Test the frontend at http://localhost:5173")
@@ -3,25 +3,152 @@
 🚀 Simple Setup Script - APC Gym Log System
 Minimal setup script for quick deployment on a new computer.
 
-Usage: python simple-setup.py
+Usage: python simple-setup.py [--run]
+  --run  start the development servers once setup succeeds
 """
 
+import hashlib
 import subprocess
 import sys
 import os
+import shutil
+import tempfile
 from pathlib import Path
 
+NPM = shutil.which("npm") or "npm"
+
+# Our fds are non-inheritable (PEP 446), so children don't need them closed;
+# with close_fds=False Popen can launch through posix_spawn instead of fork
+SPAWN_OPTIONS = {} if os.name == "nt" else {"close_fds": False}
+
+# --run hands over to start-dev.py after a successful setup
+RUN_AFTER_SETUP = "--run" in sys.argv[1:]
+
+# Download caches and install stamps kept in the project, so repeated setups
+# reuse packages and skip installs whose manifests haven't changed
+CACHE_DIR = Path(".cache")
+PIP_STAMP = CACHE_DIR / "requirements.stamp"
+NPM_STAMP = CACHE_DIR / "package-lock.stamp"
+CHECK_STAMP = CACHE_DIR / "django_check.stamp"
+# Written by start-dev.py; cleared so it checks dependencies again
+DEPS_STAMP = CACHE_DIR / "deps.stamp"
+
+# Python packages compiled ahead of time, along with the top-level scripts
+COMPILE_DIRS = ["gym_app", "gymlog_backend", "scripts"]
+
+SOURCE_HASH_SKIP_DIRS = {'venv', '.venv', 'node_modules', '.cache', '.git', '__pycache__', 'dist'}
+
+def is_up_to_date(manifest, stamp, key=""):
+    """True if `stamp` holds `key` and was written after `manifest` last changed"""
+    try:
+        return (
+            stamp.stat().st_mtime >= Path(manifest).stat().st_mtime
+            and stamp.read_text() == key
+        )
+    except OSError:
+        return False
+
+def requirements_satisfied(path):
+    """
+    True if every requirement in `path` is installed at a matching version,
+    checked against installed package metadata without starting pip
+    """
+    from importlib.metadata import version, PackageNotFoundError
+    try:
+        from packaging.requirements import Requirement
+    except ImportError:
+        # pip always ships a copy, even where packaging isn't installed
+        try:
+            from pip._vendor.packaging.requirements import Requirement
+        except ImportError:
+            return False
+    
+    try:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.split("#", 1)[0].strip()
+                if not line:
+                    continue
+                requirement = Requirement(line)
+                if requirement.marker and not requirement.marker.evaluate():
+                    continue
+                installed = version(requirement.name)
+                if not requirement.specifier.contains(installed, prereleases=True):
+                    return False
+    except (OSError, PackageNotFoundError, ValueError):
+        # ValueError covers lines packaging can't parse, e.g. pip options
+        return False
+    return True
+
+def source_hash():
+    """
+    Hash of the project's Python sources, .env, requirements.txt and the
+    interpreter in use; `manage.py check` gives the same answer while this
+    is unchanged and the requirements are installed
+    """
+    digest = hashlib.blake2b(sys.executable.encode(), digest_size=16)
+    try:
+        digest.update(Path("requirements.txt").read_bytes())
+    except OSError:
+        pass
+    pending = ["."]
+    while pending:
+        directory = pending.pop()
+        with os.scandir(directory) as entries:
+            for entry in sorted(entries, key=lambda entry: entry.name):
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name not in SOURCE_HASH_SKIP_DIRS:
+                        pending.append(entry.path)
+                elif entry.name.endswith(".py") or entry.name == ".env":
+                    digest.update(entry.path.encode())
+                    with open(entry.path, "rb") as f:
+                        digest.update(f.read())
+    return digest.hexdigest()
+
 def run_command(command, description):
-    """Run a command and return success status"""
+    """Run a command (an argument list, no shell) and return success status"""
     print(f"🔄 {description}...")
     try:
-        subprocess.run(command, shell=True, check=True)
+        subprocess.run(command, check=True, **SPAWN_OPTIONS)
         print(f"✅ {description} - Success")
         return True
-    except subprocess.CalledProcessError:
+    except (subprocess.CalledProcessError, OSError):
         print(f"❌ {description} - Failed")
         return False
 
+def start_command(command, description):
+    """
+    Start a command in the background with its output captured to a
+    temporary file, so concurrent commands don't interleave on screen.
+    Returns (process, log) or (None, None) if it couldn't be started.
+    """
+    print(f"🔄 {description} (in background)...")
+    log = tempfile.TemporaryFile()
+    try:
+        process = subprocess.Popen(
+            command, stdout=log, stderr=subprocess.STDOUT, **SPAWN_OPTIONS
+        )
+    except OSError as e:
+        log.close()
+        print(f"❌ {description} - Failed: {e}")
+        return None, None
+    return process, log
+
+def finish_command(process, log, description):
+    """Wait for a command from start_command and return success status"""
+    if process is None:
+        return False
+    try:
+        if process.wait() == 0:
+            print(f"✅ {description} - Success")
+            return True
+        print(f"❌ {description} - Failed")
+        log.seek(0)
+        print(log.read().decode('utf-8', errors='replace'))
+        return False
+    finally:
+        log.close()
+
 def main():
     """Main setup function"""
     print("🚀 APC Gym Log System - Simple Setup")
@@ -37,22 +164,80 @@ def main():
     
     # Setup steps
     steps_passed = 0
-    total_steps = 4
+    total_steps = 5
     
-    # Step 1: Install Python dependencies
-    if run_command("pip install -r requirements.txt", "Installing Python dependencies"):
-        steps_passed += 1
+    # Steps 1 and 2: pip and npm don't depend on each other, so they run
+    # at the same time
+    python_deps = "Installing Python dependencies"
+    node_deps = "Installing Node.js dependencies"
+    CACHE_DIR.mkdir(exist_ok=True)
+    DEPS_STAMP.unlink(missing_ok=True)
+    os.environ.setdefault("PIP_CACHE_DIR", str(CACHE_DIR / "pip"))
+    os.environ.setdefault("npm_config_cache", str(CACHE_DIR / "npm"))
+    
+    pip_process = pip_log = None
+    # Keyed by interpreter so switching virtualenvs installs again
+    pip_skipped = is_up_to_date("requirements.txt", PIP_STAMP, sys.executable)
+    if pip_skipped:
+        print(f"✅ {python_deps} - Up to date")
+    elif requirements_satisfied("requirements.txt"):
+        pip_skipped = True
+        print(f"✅ {python_deps} - Already satisfied")
+    else:
+        pip_process, pip_log = start_command(
+            [sys.executable, "-m", "pip", "install", "--prefer-binary", "-r", "requirements.txt"],
+            python_deps
+        )
+    
+    npm_process = npm_log = None
+    # npm ci installs exactly the lockfile without resolving the tree again
+    has_lockfile = Path("package-lock.json").exists()
+    npm_skipped = (
+        has_lockfile and Path("node_modules").exists()
+        and is_up_to_date("package-lock.json", NPM_STAMP)
+    )
+    if npm_skipped:
+        print(f"✅ {node_deps} - Up to date")
+    else:
+        npm_process, npm_log = start_command(
+            [NPM, "ci" if has_lockfile else "install", "--prefer-offline", "--no-audit", "--no-fund"],
+            node_deps
+        )
     
-    # Step 2: Install Node.js dependencies
-    if run_command("npm install", "Installing Node.js dependencies"):
+    # The Django steps need the Python dependencies only
+    pip_ok = pip_skipped or finish_command(pip_process, pip_log, python_deps)
+    if pip_ok:
+        PIP_STAMP.write_text(sys.executable)
         steps_passed += 1
     
     # Step 3: Run database migrations
-    if run_command("python manage.py migrate", "Setting up database"):
+    if run_command([sys.executable, "manage.py", "migrate"], "Setting up database"):
+        steps_passed += 1
+    
+    # Step 4: Verify Django setup, unless these exact sources already passed
+    # against the same installed requirements
+    current_hash = source_hash()
+    if pip_ok and CHECK_STAMP.exists() and CHECK_STAMP.read_text() == current_hash:
+        print("✅ Verifying Django configuration - Unchanged since last check")
+        steps_passed += 1
+    elif run_command([sys.executable, "manage.py", "check"], "Verifying Django configuration"):
+        CHECK_STAMP.write_text(current_hash)
+        steps_passed += 1
+    
+    # Step 5: Compile bytecode now rather than on each server's first start
+    # (already up-to-date files are skipped). Only the project's own sources
+    # are listed, so compileall never walks node_modules or a virtualenv
+    sources = [path for path in COMPILE_DIRS if Path(path).is_dir()]
+    sources += sorted(str(path) for path in Path(".").glob("*.py"))
+    if run_command(
+        [sys.executable, "-m", "compileall", "-q", "-j", "0", *sources],
+        "Pre-compiling bytecode"
+    ):
         steps_passed += 1
     
-    # Step 4: Verify Django setup
-    if run_command("python manage.py check", "Verifying Django configuration"):
+    if npm_skipped or finish_command(npm_process, npm_log, node_deps):
+        if has_lockfile:
+            NPM_STAMP.write_text("")
         steps_passed += 1
     
     # Results
@@ -61,6 +246,11 @@ def main():
     
     if steps_passed == total_steps:
         print("🎉 Setup completed successfully!")
+        if RUN_AFTER_SETUP:
+            print("\n🚀 Starting development servers...")
+            sys.stdout.flush()
+            # Replace this interpreter instead of starting a second one
+            os.execv(sys.executable, [sys.executable, "start-dev.py"])
         print("\n🚀 Ready to start:")
         print("   python start-dev.py")
         print("\n📍 Then open: http://localhost:5173")
@@ -1,12 +1,31 @@
 import React from 'react'
-import { format, startOfWeek, addDays, startOfYear, endOfYear, eachWeekOfInterval, isSameMonth, isSameYear } from 'date-fns'
+import { format, startOfWeek, addDays, startOfYear, endOfYear, eachWeekOfInterval, isSameMonth, isSameYear, isWeekend, parseISO } from 'date-fns'
+
+// The API sends parallel counts/levels arrays covering consecutive workdays
+// from start_date; expand them into { date, count, level } items
+const expandHeatmapData = (heatmap) => {
+  if (!heatmap || !heatmap.counts) return []
+  const items = []
+  let date = parseISO(heatmap.start_date)
+  for (let i = 0; i < heatmap.counts.length; i++) {
+    while (isWeekend(date)) date = addDays(date, 1)
+    items.push({
+      date: format(date, 'yyyy-MM-dd'),
+      count: heatmap.counts[i],
+      level: heatmap.levels[i]
+    })
+    date = addDays(date, 1)
+  }
+  return items
+}
+
+const HeatmapCalendar = ({ data: heatmap }) => {
+  const data = expandHeatmapData(heatmap)
 
-const HeatmapCalendar = ({ data = [] }) => {
   // Create a map for quick data lookup
   const dataMap = new Map()
   data.forEach(item => {
-    const dateStr = format(new Date(item.date), 'yyyy-MM-dd')
-    dataMap.set(dateStr, item)
+    dataMap.set(item.date, item)
   })
 
   // Get the current year's date range
@@ -71,7 +90,7 @@ const HeatmapCalendar = ({ data = [] }) => {
 
   // Get tooltip text
   const getTooltipText = (cellData) => {
-    const date = format(new Date(cellData.date), 'MMM d, yyyy')
+    const date = format(parseISO(cellData.date), 'MMM d, yyyy')
     if (cellData.count === 0) {
       return `No gym time on ${date}`
     }
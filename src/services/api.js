@@ -51,9 +51,10 @@ export const studentAPI = {
   login: (rfidData) => api.post('/login/', rfidData),
   
   // Get student statistics and heatmap data
-  getStats: (studentId) => api.get(`/stats/${studentId}/`),
+  // range: optional heatmap window ('30d', '90d', '1y' or 'ytd'; server default 'ytd')
+  getStats: (studentId, range) => api.get(`/stats/${studentId}/`, { params: range ? { range } : {} }),
   
-  // Get student statistics using RFID
+  // Get student statistics using RFID (rfidData may include a range)
   getStatsRFID: (rfidData) => api.post('/stats/rfid/', rfidData),
 }
 
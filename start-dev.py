@@ -4,55 +4,225 @@ Quick development server start script for APC Gym Log System
 This script starts both Django backend and React frontend servers.
 """
 
+import importlib.util
+import selectors
 import subprocess
 import sys
 import os
 import time
 import threading
+import shutil
+import signal
+import socket
 from pathlib import Path
 
-def run_command(command, cwd=None, name="Process"):
-    """Run a command in a separate thread"""
+# npm is a .cmd shim on Windows, which needs its full path without a shell
+NPM = shutil.which("npm") or "npm"
+
+# Result of the last successful dependency check; simple-setup.py removes it
+DEPS_STAMP = Path(".cache") / "deps.stamp"
+
+# Each server runs in its own process group so shutdown reaches the processes
+# it starts too (npm runs vite as a child). process_group keeps them in this
+# terminal session; neither option lets Popen use posix_spawn
+if os.name == "nt":
+    GROUP_OPTIONS = {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+elif sys.version_info >= (3, 11):
+    GROUP_OPTIONS = {"process_group": 0}
+else:
+    GROUP_OPTIONS = {"start_new_session": True}
+
+# Server processes started so far, for stop_processes()
+CHILDREN = []
+
+def format_prefixed_lines(lines, name):
+    """Format the non-blank lines of a process's output, tagged with its name"""
+    return ''.join(
+        f"[{name}] {text}\n"
+        for text in (line.decode('utf-8', errors='replace').strip() for line in lines)
+        if text
+    )
+
+def write_prefixed_lines(lines, name):
+    """Write the non-blank lines of a process's output, tagged with its name"""
+    output = format_prefixed_lines(lines, name)
+    if output:
+        sys.stdout.write(output)
+        sys.stdout.flush()
+
+def start_process(command, name):
+    """Start a command (an argument list, no shell) with its output piped back"""
+    print(f"🚀 Starting {name}...")
+    process = subprocess.Popen(
+        command,
+        # Servers in a background process group are stopped (SIGTTIN) if they
+        # read the terminal, as vite does for its keyboard shortcuts
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        bufsize=0,
+        **GROUP_OPTIONS
+    )
+    CHILDREN.append(process)
+    return process
+
+def signal_group(process, sig):
+    """Send `sig` to a server's whole process group"""
     try:
-        print(f"🚀 Starting {name}...")
-        process = subprocess.Popen(
-            command,
-            shell=True,
-            cwd=cwd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            universal_newlines=True,
-            bufsize=1
-        )
-        
-        # Print output in real-time
-        for line in iter(process.stdout.readline, ''):
-            if line.strip():
-                print(f"[{name}] {line.strip()}")
-        
-        process.stdout.close()
-        return_code = process.wait()
-        
-        if return_code != 0:
-            print(f"❌ {name} exited with code {return_code}")
-        
-    except KeyboardInterrupt:
-        print(f"\n🛑 Stopping {name}...")
-        process.terminate()
+        if os.name == "nt":
+            process.send_signal(sig)
+        else:
+            os.killpg(process.pid, sig)
+    except (ProcessLookupError, OSError):
+        pass
+
+def stop_processes(timeout=5.0):
+    """Ask every server to stop, then kill whatever is still running after `timeout`"""
+    # Windows can only deliver Ctrl+Break to a process group
+    stop = signal.CTRL_BREAK_EVENT if os.name == "nt" else signal.SIGTERM
+    for process in CHILDREN:
+        if process.poll() is None:
+            signal_group(process, stop)
+    
+    deadline = time.monotonic() + timeout
+    for process in CHILDREN:
+        try:
+            process.wait(timeout=max(0, deadline - time.monotonic()))
+        except subprocess.TimeoutExpired:
+            if os.name == "nt":
+                process.kill()
+            else:
+                signal_group(process, signal.SIGKILL)
+            process.wait()
+
+def exit_on_signal(signum, frame):
+    """Turn SIGTERM/SIGHUP into a normal exit, so main() still stops the servers"""
+    sys.exit(128 + signum)
+
+def report_exit(process, name):
+    """Close a finished process's pipe and report a non-zero exit code"""
+    process.stdout.close()
+    return_code = process.wait()
+    if return_code != 0:
+        print(f"❌ {name} exited with code {return_code}")
+
+def run_command(process, name="Process"):
+    """Forward one process's output until it exits (blocking; used on Windows)"""
+    try:
+        # Read whatever is available in one syscall, split it into lines
+        # and write them out together
+        fd = process.stdout.fileno()
+        buffer = b''
+        while True:
+            chunk = os.read(fd, 65536)
+            if not chunk:
+                break
+            *lines, buffer = (buffer + chunk).split(b'\n')
+            write_prefixed_lines(lines, name)
+        # Output that didn't end with a newline
+        write_prefixed_lines([buffer], name)
+        report_exit(process, name)
     except Exception as e:
         print(f"❌ Error running {name}: {str(e)}")
 
+def forward_output(processes):
+    """
+    Forward the output of several (process, name) pairs from a single thread
+    until all of them exit. Windows can't select() on pipes, so there each
+    process gets its own reader thread instead.
+    """
+    if os.name == "nt":
+        threads = [
+            threading.Thread(target=run_command, args=(process, name), daemon=True)
+            for process, name in processes
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return
+    
+    sel = selectors.DefaultSelector()
+    for process, name in processes:
+        fd = process.stdout.fileno()
+        os.set_blocking(fd, False)
+        # Per-process state: name and the partial line left from the last read
+        sel.register(fd, selectors.EVENT_READ, [process, name, b''])
+    
+    while sel.get_map():
+        # Everything read in one tick goes out in a single write and flush
+        out_parts = []
+        finished = []
+        for key, _ in sel.select(timeout=1.0):
+            state = key.data
+            process, name, buffer = state
+            try:
+                chunk = os.read(key.fd, 65536)
+            except BlockingIOError:
+                continue
+            if not chunk:
+                # EOF: flush output that didn't end with a newline
+                sel.unregister(key.fd)
+                out_parts.append(format_prefixed_lines([buffer], name))
+                finished.append((process, name))
+                continue
+            *lines, state[2] = (buffer + chunk).split(b'\n')
+            out_parts.append(format_prefixed_lines(lines, name))
+        output = ''.join(out_parts)
+        if output:
+            sys.stdout.write(output)
+            sys.stdout.flush()
+        for process, name in finished:
+            report_exit(process, name)
+    sel.close()
+
+def wait_for_port(host, port, process=None, timeout=15.0):
+    """
+    Wait until something accepts TCP connections on host:port. False on
+    timeout, or as soon as `process` (the server expected to listen) exits
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            return False
+        try:
+            with socket.create_connection((host, port), timeout=0.2):
+                return True
+        except OSError:
+            time.sleep(0.05)
+    return False
+
+def dependency_state():
+    """
+    Modification times of the dependency manifests and node_modules, plus the
+    interpreter in use; changes whenever the installed dependencies may have
+    """
+    parts = [sys.executable]
+    for path in ("requirements.txt", "package-lock.json", "node_modules"):
+        try:
+            parts.append(str(os.stat(path).st_mtime_ns))
+        except OSError:
+            parts.append("-")
+    return "|".join(parts)
+
 def check_dependencies():
     """Check if required dependencies are installed"""
     print("🔍 Checking dependencies...")
     
-    # Check Python dependencies
+    # Nothing to check if the dependencies haven't changed since they last passed
+    state = dependency_state()
     try:
-        import django
-        print("✅ Django is installed")
-    except ImportError:
+        if DEPS_STAMP.read_text() == state:
+            print("✅ Dependencies unchanged since last start")
+            return True
+    except OSError:
+        pass
+    
+    # Check Python dependencies (find_spec locates Django without importing it)
+    if importlib.util.find_spec("django") is None:
         print("❌ Django not found. Run: pip install -r requirements.txt")
         return False
+    print("✅ Django is installed")
     
     # Check if node_modules exists
     if not Path("node_modules").exists():
@@ -61,22 +231,41 @@ def check_dependencies():
     else:
         print("✅ Node modules are installed")
     
+    try:
+        DEPS_STAMP.parent.mkdir(exist_ok=True)
+        DEPS_STAMP.write_text(state)
+    except OSError:
+        pass
     return True
 
 def run_migrations():
     """Run Django migrations"""
     print("🔄 Running Django migrations...")
+    # Migrate in this process instead of starting another interpreter that
+    # loads Django and every app again
     try:
-        result = subprocess.run(
-            ["python", "manage.py", "migrate"],
-            capture_output=True,
-            text=True,
-            check=True
-        )
-        print("✅ Migrations completed successfully")
-        return True
-    except subprocess.CalledProcessError as e:
-        print(f"❌ Migration failed: {e.stderr}")
+        os.environ.setdefault("DJANGO_SETTINGS_MODULE", "gymlog_backend.settings")
+        import django
+        django.setup()
+        from django.core.management import call_command
+        from django.db import connection, connections
+        from django.db.migrations.executor import MigrationExecutor
+        
+        try:
+            executor = MigrationExecutor(connection)
+            if not executor.migration_plan(executor.loader.graph.leaf_nodes()):
+                print("✅ Migrations up to date")
+                return True
+            
+            # Output goes straight to the terminal so progress shows as it happens
+            call_command("migrate", verbosity=1)
+            print("✅ Migrations completed successfully")
+            return True
+        finally:
+            # Don't hold the database open while the servers run
+            connections.close_all()
+    except Exception as e:
+        print(f"❌ Migration failed: {e}")
         return False
 
 def main():
@@ -100,42 +289,51 @@ def main():
     print("📍 Press Ctrl+C to stop both servers")
     print("-" * 60)
     
+    # The servers sit in their own process groups, so closing the terminal or
+    # a plain kill reaches only this script; pass it on to them
+    for name in ("SIGTERM", "SIGHUP"):
+        if hasattr(signal, name):
+            signal.signal(getattr(signal, name), exit_on_signal)
+    
+    processes = []
     try:
-        # Start Django backend in a thread
-        backend_thread = threading.Thread(
-            target=run_command,
-            args=("python manage.py runserver", None, "Django Backend"),
-            daemon=True
-        )
-        backend_thread.start()
+        backend = start_process([sys.executable, "manage.py", "runserver"], "Django Backend")
+        processes.append((backend, "Django Backend"))
         
-        # Give backend time to start
-        time.sleep(3)
+        # Start the frontend once the backend accepts connections; the
+        # backend's startup output stays in its pipe until then
+        if not wait_for_port("127.0.0.1", 8000, backend):
+            if backend.poll() is not None:
+                # Show why it stopped (e.g. an import error or the port in
+                # use); the exit code is reported along with the output
+                forward_output(processes)
+                print("\n❌ Backend failed to start, not starting the frontend.")
+                sys.exit(1)
+            print("⚠️  Backend not reachable yet, starting frontend anyway")
         
-        # Start React frontend in a thread
-        frontend_thread = threading.Thread(
-            target=run_command,
-            args=("npm run dev", None, "React Frontend"),
-            daemon=True
-        )
-        frontend_thread.start()
+        processes.append((
+            start_process([NPM, "run", "dev"], "React Frontend"),
+            "React Frontend"
+        ))
         
-        # Keep main thread alive
         print("\n✅ Both servers are starting...")
         print("💡 Tip: Open http://localhost:5173 in your browser")
         print("💡 Admin panel: http://localhost:8000/admin")
         print("\n🔄 Server logs will appear below:")
         print("-" * 60)
         
-        # Wait for threads to complete (they won't unless there's an error)
-        backend_thread.join()
-        frontend_thread.join()
+        # Runs until both servers exit (they won't unless there's an error)
+        forward_output(processes)
         
     except KeyboardInterrupt:
         print("\n\n🛑 Shutting down servers...")
+        stop_processes()
         print("👋 Thanks for using APC Gym Log System!")
     except Exception as e:
         print(f"\n❌ Unexpected error: {str(e)}")
+    finally:
+        # Also covers SIGTERM/SIGHUP, errors and a backend that failed to start
+        stop_processes()
 
 if __name__ == "__main__":
     main()